@@ -0,0 +1,373 @@
+# =============================================================================
+# API JSON DOS KPIs E AGREGADOS DO DASHBOARD (ASYNCIO)
+# =============================================================================
+# Serviço HTTP leve, ao lado do dashboard, para outros sistemas consultarem os
+# números do dashboard sem carregar a página do Streamlit. Usa o mesmo backend
+# (backends.py, mesmas variáveis de ambiente) e as mesmas consultas.
+# Rotas (GET), com resposta em JSON compacto:
+#   /options            valores disponíveis em cada filtro
+#   /kpis               KPIs do dashboard (receita, clientes, pedidos, ticket médio...)
+#   /revenue/category   receita por categoria
+#   /revenue/state      receita por estado
+#   /revenue/month      receita por mês
+#   /status             pedidos por status
+#   /segments           clientes por segmento RFM (RFM dos meses e estados selecionados)
+# Filtros nos parâmetros months, categories, statuses, states e rfm_segments, com
+# valores separados por vírgula (ou o parâmetro repetido). Filtro ausente = seleção
+# inicial do dashboard (tudo, e só pedidos entregues em statuses). Filtro vazio =
+# nenhum valor, exceto rfm_segments: vazio = sem filtro de segmento, como no
+# dashboard (inclui clientes sem segmento RFM; em /segments, todos os segmentos).
+# /segments aceita só months, states e rfm_segments (a segmentação RFM usa todos os
+# pedidos entregues dos clientes): categories e statuses são recusados (400).
+# approximate=1 estima os clientes únicos por HyperLogLog (memoria) e só vale em
+# /kpis; nas demais rotas é ignorado.
+# O servidor (asyncio) só recebe as requisições e responde: as consultas rodam em
+# um pool de threads ou, com DASHBOARD_SHARED=1, em um pool de processos que mapeiam
+# os mesmos dados publicados (ver shared_dataset.py). Respostas repetidas saem de
+# um cache por versão dos dados e seleção, com ETag: If-None-Match recebe 304.
+# Uso: python api.py [--host 0.0.0.0] [--port 8000] [--workers 4] [--data caminho]
+
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlsplit
+
+from backends import BACKENDS, FILTERS, create_backend, default_selection, selected_backend
+from compact import MemoryBudgetError
+from result_cache import DEFAULT_BUDGET_MB, ResultCache, canonical
+from rfm import SEGMENTS
+
+DEFAULT_CACHE_MB = 64
+REFRESH_SECONDS = 1.0
+KEEPALIVE_SECONDS = 15.0
+KPI_NAMES = ['total_revenue', 'unique_customers', 'total_orders', 'avg_ticket',
+             'avg_orders_per_customer', 'conversion_rate']
+
+logger = logging.getLogger("dashboard.api")
+
+Response = namedtuple('Response', ['status', 'body', 'etag', 'version'])
+
+
+class RequestError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+# =============================================================================
+# Consultas (executadas no pool de threads ou de processos)
+# =============================================================================
+
+# Backend e cache de resultados do processo que executa as consultas
+_backend = None
+_results = None
+
+
+def start_worker(name, base_path, budget_mb):
+    global _backend, _results
+    _backend = create_backend(name, base_path)
+    _results = ResultCache(budget_mb)
+
+
+def _result(query, *args):
+    return _results.get(_backend.version, (_backend.name, query) + args,
+                        lambda: getattr(_backend, query)(*args))
+
+
+# {valor: medida} a partir das duas colunas de um resultado do backend
+def _mapping(frame):
+    keys, values = frame.columns[:2]
+    return dict(zip(frame[keys].astype(str), frame[values].tolist()))
+
+
+def _visualization(position):
+    return lambda selection, approximate: _mapping(_result('visualizations', selection, False)[position])
+
+
+def _kpis(selection, approximate):
+    values = _result('kpis', selection, approximate)
+    return {name: int(v) if name in ('unique_customers', 'total_orders') else float(v)
+            for name, v in zip(KPI_NAMES, values)}
+
+
+# Clientes por segmento; com todos os meses e estados, a segmentação global do dashboard.
+# rfm_segments vazio = todos os segmentos.
+def _segments(selection, approximate):
+    options = _result('options')
+    if set(selection['months']) >= set(options['months']) and set(selection['states']) >= set(options['states']):
+        rfm = _result('rfm_table')
+    else:
+        rfm = _result('segment_population', selection['months'], selection['states'])
+    counts = rfm['segment'].value_counts()
+    wanted = selection['rfm_segments'] or SEGMENTS
+    return {s: int(counts.get(s, 0)) for s in SEGMENTS if s in wanted}
+
+
+# Consulta, filtros aceitos e uso de approximate em cada rota
+Route = namedtuple('Route', ['query', 'filters', 'approximate'])
+
+ROUTES = {
+    '/kpis': Route(_kpis, FILTERS, True),
+    '/revenue/category': Route(_visualization(1), FILTERS, False),
+    '/revenue/state': Route(_visualization(2), FILTERS, False),
+    '/revenue/month': Route(_visualization(3), FILTERS, False),
+    '/status': Route(_visualization(4), FILTERS, False),
+    '/segments': Route(_segments, ['months', 'states', 'rfm_segments'], False),
+}
+
+
+# Resposta de uma rota: versão dos dados usada e corpo JSON
+def run_query(path, selection, approximate):
+    _backend.refresh()
+    version = _backend.version
+    payload = ROUTES[path].query(selection, approximate)
+    return version, json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+# =============================================================================
+# Cache de respostas (no laço de eventos)
+# =============================================================================
+
+class ResponseCache:
+    def __init__(self, budget_mb=DEFAULT_CACHE_MB):
+        self.budget = int(budget_mb * 2 ** 20)
+        self._entries = OrderedDict()
+        self._pending = {}
+        self.version = None
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _store(self, key, response):
+        size = len(response.body)
+        if size > self.budget:
+            return
+        self._entries[key] = response
+        self.size += size
+        while self.size > self.budget:
+            _, evicted = self._entries.popitem(last=False)
+            self.size -= len(evicted.body)
+            self.evictions += 1
+
+    # Resposta da chave na versão dos dados; compute() é uma corrotina que devolve uma Response.
+    # Requisições iguais ao mesmo tempo esperam um único cálculo.
+    async def get(self, version, key, compute):
+        if version != self.version:
+            self._entries.clear()
+            self._pending.clear()
+            self.size = 0
+            self.version = version
+        key = canonical(key)
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key]
+        pending = self._pending.get(key)
+        if pending is not None:
+            return await asyncio.shield(pending)
+        self.misses += 1
+        pending = self._pending[key] = asyncio.get_running_loop().create_future()
+        try:
+            response = await compute()
+        except asyncio.CancelledError:
+            pending.cancel()
+            raise
+        except Exception as e:
+            pending.set_exception(e)
+            pending.exception()  # Só quem espera recebe o erro
+            raise
+        finally:
+            if self._pending.get(key) is pending:
+                del self._pending[key]
+        # Respostas calculadas com uma versão mais nova que a da chave não entram no cache
+        if response.version == self.version:
+            self._store(key, response)
+        pending.set_result(response)
+        return response
+
+    def stats(self):
+        return {'entries': len(self._entries), 'bytes': self.size, 'budget_bytes': self.budget,
+                'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions}
+
+
+# =============================================================================
+# Servidor HTTP
+# =============================================================================
+
+def etag_of(body):
+    return f'"{hashlib.sha1(body).hexdigest()[:20]}"'
+
+
+def json_response(status, payload, version=None):
+    body = json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return Response(status, body, etag_of(body), version)
+
+
+# Seleção dos filtros aceitos pela rota a partir dos parâmetros; parâmetros que a rota
+# não aceita e valores fora das opções são rejeitados. A seleção e approximate
+# formam a chave do cache: approximate só conta nas rotas que o usam.
+def parse_selection(query, options, route):
+    unsupported = sorted(set(query) - set(FILTERS) - {'approximate'})
+    if unsupported:
+        raise RequestError(HTTPStatus.BAD_REQUEST, f"parâmetros desconhecidos: {', '.join(unsupported)}")
+    unsupported = sorted(set(query) & (set(FILTERS) - set(route.filters)))
+    if unsupported:
+        raise RequestError(HTTPStatus.BAD_REQUEST, f"filtros não aceitos nesta rota: {', '.join(unsupported)}")
+    defaults = default_selection(options)
+    selection = {dim: defaults[dim] for dim in route.filters}
+    for dim in route.filters:
+        if dim in query:
+            values = {v for raw in query[dim] for v in raw.split(',') if v}
+            invalid = sorted(values - set(options[dim]))
+            if invalid:
+                raise RequestError(HTTPStatus.BAD_REQUEST, f"{dim}: valores desconhecidos: {', '.join(invalid)}")
+            # Vazio = nenhum valor; em rfm_segments, sem filtro de segmento (como nos backends)
+            selection[dim] = [v for v in options[dim] if v in values]
+    approximate = route.approximate and query.get('approximate', ['0'])[-1] in ('1', 'true')
+    return selection, approximate
+
+
+def _matches(if_none_match, etag):
+    tags = [tag.strip() for tag in if_none_match.split(',')]
+    return '*' in tags or etag in tags or f"W/{etag}" in tags
+
+
+class APIServer:
+    def __init__(self, backend, executor, cache_mb=DEFAULT_CACHE_MB):
+        self.backend = backend
+        self.executor = executor
+        self.cache = ResponseCache(cache_mb)
+        self.version = backend.version
+        self.options = backend.options()
+
+    # Incorpora dados novos em segundo plano (lotes em incoming/ ou nova versão publicada)
+    async def refresh_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(REFRESH_SECONDS)
+            try:
+                version = await loop.run_in_executor(None, self.backend.refresh)
+                if version != self.version:
+                    self.options = await loop.run_in_executor(None, self.backend.options)
+                    self.version = version
+            except Exception:
+                logger.exception("Falha ao atualizar os dados")
+
+    async def respond(self, method, target):
+        if method != 'GET':
+            raise RequestError(HTTPStatus.METHOD_NOT_ALLOWED, "use GET")
+        url = urlsplit(target)
+        query = parse_qs(url.query, keep_blank_values=True)
+        if url.path == '/health':
+            return json_response(HTTPStatus.OK, {'status': 'ok', 'version': self.version,
+                                                 'cache': self.cache.stats()})
+        if url.path == '/options':
+            return json_response(HTTPStatus.OK, self.options, self.version)
+        if url.path not in ROUTES:
+            raise RequestError(HTTPStatus.NOT_FOUND, f"rota desconhecida: {url.path}")
+        selection, approximate = parse_selection(query, self.options, ROUTES[url.path])
+
+        async def compute():
+            loop = asyncio.get_running_loop()
+            version, body = await loop.run_in_executor(self.executor, run_query, url.path, selection, approximate)
+            return Response(HTTPStatus.OK, body, etag_of(body), version)
+
+        return await self.cache.get(self.version, (url.path, selection, approximate), compute)
+
+    # Uma conexão HTTP/1.1 (keep-alive): linha da requisição, cabeçalhos e corpo (descartado)
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                request_line = await asyncio.wait_for(reader.readline(), KEEPALIVE_SECONDS)
+                if not request_line:
+                    break
+                parts = request_line.decode('latin-1').split()
+                headers = {}
+                while True:
+                    line = await asyncio.wait_for(reader.readline(), KEEPALIVE_SECONDS)
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                if int(headers.get('content-length') or 0):
+                    await reader.readexactly(int(headers['content-length']))
+                try:
+                    if len(parts) != 3:
+                        raise RequestError(HTTPStatus.BAD_REQUEST, "requisição inválida")
+                    response = await self.respond(parts[0], parts[1])
+                except RequestError as e:
+                    response = json_response(e.status, {'error': str(e)})
+                except MemoryBudgetError as e:
+                    response = json_response(HTTPStatus.SERVICE_UNAVAILABLE, {'error': str(e)})
+                except Exception:
+                    logger.exception("Erro em %s", request_line.decode('latin-1').strip())
+                    response = json_response(HTTPStatus.INTERNAL_SERVER_ERROR, {'error': "erro interno"})
+                keep_alive = len(parts) == 3 and parts[2] == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+                not_modified = response.status == HTTPStatus.OK and _matches(headers.get('if-none-match', ''), response.etag)
+                status = HTTPStatus.NOT_MODIFIED if not_modified else HTTPStatus(response.status)
+                head = [f"HTTP/1.1 {status.value} {status.phrase}",
+                        f"ETag: {response.etag}",
+                        f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+                if response.version is not None:
+                    head.append(f"X-Data-Version: {response.version}")
+                body = b'' if not_modified else response.body
+                if not not_modified:
+                    head += ["Content-Type: application/json; charset=utf-8", f"Content-Length: {len(body)}"]
+                writer.write(('\r\n'.join(head) + '\r\n\r\n').encode('latin-1') + body)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError, ConnectionError):
+            pass  # Conexão ociosa, encerrada pelo cliente ou requisição malformada
+        finally:
+            writer.close()
+
+
+# Pool das consultas: processos quando os dados são mapeados de uma versão publicada
+# (cada processo mapeia os mesmos arquivos); senão threads sobre o backend deste processo
+def create_executor(name, base_path, workers, budget_mb):
+    if name == 'memoria' and os.environ.get('DASHBOARD_SHARED') == '1':
+        executor = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn'),
+                                       initializer=start_worker, initargs=(name, base_path, budget_mb))
+        return executor, create_backend(name, base_path)
+    start_worker(name, base_path, budget_mb)
+    return ThreadPoolExecutor(workers, thread_name_prefix='api-query'), _backend
+
+
+async def serve(host, port, base_path, workers, cache_mb, budget_mb):
+    name = selected_backend()
+    if name not in BACKENDS:
+        raise SystemExit(f"DASHBOARD_BACKEND inválido: {name}. Use {' ou '.join(BACKENDS)}.")
+    executor, backend = create_executor(name, base_path, workers, budget_mb)
+    api = APIServer(backend, executor, cache_mb)
+    server = await asyncio.start_server(api.handle, host, port)
+    refresh = asyncio.create_task(api.refresh_loop())
+    logger.info("API em http://%s:%d (backend %s, %d workers)", host, port, name, workers)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        refresh.cancel()
+        executor.shutdown(cancel_futures=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="API JSON dos KPIs e agregados do dashboard.")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=int(os.environ.get('PORT', 8000)))
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="threads ou processos das consultas")
+    parser.add_argument("--data", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "Ecommerce_Dataset"),
+                        help="pasta do Ecommerce_Dataset")
+    parser.add_argument("--cache-mb", type=float, default=DEFAULT_CACHE_MB, help="memória do cache de respostas")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(name)s %(message)s')
+    budget_mb = float(os.environ.get('DASHBOARD_CACHE_MB', DEFAULT_BUDGET_MB))
+    asyncio.run(serve(args.host, args.port, args.data, args.workers, args.cache_mb, budget_mb))
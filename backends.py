@@ -0,0 +1,46 @@
+# =============================================================================
+# BACKENDS DE DADOS E SELEÇÃO INICIAL DOS FILTROS
+# =============================================================================
+# Usado pelo dashboard (dashboard.py) e pela API (api.py), para que os dois
+# respondam com os mesmos dados e a mesma seleção padrão. O backend é escolhido
+# pela variável de ambiente DASHBOARD_BACKEND:
+#   memoria (padrão): tabela fato, bitmaps e cubo em memória (ver memory_backend.py);
+#                     DASHBOARD_COMPACT=1 usa o esquema compacto (ver compact.py),
+#                     DASHBOARD_MEMORY_MB limita a memória dos dados carregados e
+#                     DASHBOARD_SHARED=1 mapeia a versão publicada pelo carregador
+#                     (ver shared_dataset.py);
+#   sqlite: consultas parametrizadas em um banco SQLite (ver sql_backend.py).
+
+import os
+
+from memory_backend import MemoryBackend
+from sql_backend import SQLBackend
+
+BACKENDS = {'memoria': MemoryBackend, 'sqlite': SQLBackend}
+DEFAULT_BACKEND = 'memoria'
+DEFAULT_STATUSES = ['Entregue']
+FILTERS = ['months', 'categories', 'statuses', 'states', 'rfm_segments']
+
+
+def selected_backend():
+    return os.environ.get('DASHBOARD_BACKEND', DEFAULT_BACKEND)
+
+
+# Opções do backend a partir das variáveis de ambiente
+def backend_options(name):
+    if name != 'memoria':
+        return {}
+    return dict(compact=os.environ.get('DASHBOARD_COMPACT') == '1',
+                memory_budget_mb=float(os.environ.get('DASHBOARD_MEMORY_MB', 0)) or None,
+                shared=os.environ.get('DASHBOARD_SHARED') == '1')
+
+
+def create_backend(name, base_path):
+    return BACKENDS[name](base_path, **backend_options(name))
+
+
+# Seleção inicial dos filtros: tudo selecionado, exceto o status (só pedidos entregues)
+def default_selection(options):
+    return dict(months=options['months'], categories=options['categories'],
+                statuses=[s for s in options['statuses'] if s in DEFAULT_STATUSES],
+                states=options['states'], rfm_segments=options['rfm_segments'])
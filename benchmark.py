@@ -0,0 +1,190 @@
+# =============================================================================
+# BENCHMARK DAS ETAPAS DO DASHBOARD (SEM STREAMLIT)
+# =============================================================================
+# Mede cada etapa do pipeline de dados do dashboard, sobre datasets sintéticos
+# gerados pelo data_generator.py em vários fatores de escala (1 = 50.000 pedidos)
+# e uma matriz de seleções de filtros realistas:
+#   preparo  snapshot colunar (memoria) ou banco SQLite (sqlite)
+#   carga    criação do backend (o que o dashboard faz no st.cache_resource), com
+#            as mesmas opções do dashboard (backends.py: DASHBOARD_COMPACT etc.)
+#   filtro   linhas da tabela fato que passam na seleção
+#   kpis     backend.kpis (calculate_kpis do dashboard)
+#   graficos backend.visualizations (get_visualizations do dashboard)
+# Para cada etapa: tempo de parede (mediana e primeira execução, que inclui a carga
+# sob demanda das partições), pico de memória alocada pelo Python/NumPy
+# (tracemalloc, em uma execução separada; arquivos mapeados em memória pelo Arrow
+# não entram) e linhas processadas.
+# Os resultados são gravados em JSON e comparados com um baseline: etapas mais
+# lentas ou com mais memória além da tolerância fazem o comando falhar.
+# Uso: python benchmark.py [--scales 1,10,100] [--backends memoria,sqlite]
+#                          [--baseline benchmark_baseline.json] [--update-baseline]
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+import data_generator
+import snapshot
+import sql_backend
+from backends import BACKENDS, create_backend, default_selection
+
+DATA_DIR = "benchmark_data"
+RESULTS_FILE = "benchmark_results.json"
+BASELINE_FILE = "benchmark_baseline.json"
+DATASET_FILE = "dataset.json"
+SOUTHEAST = ['ES', 'MG', 'RJ', 'SP']
+
+
+# Seleções de filtros a partir dos valores disponíveis (a padrão é a do dashboard)
+def selections(options):
+    default = default_selection(options)
+    return {
+        'padrao': default,
+        'todos_status': {**default, 'statuses': options['statuses']},
+        'ultimo_mes': {**default, 'months': options['months'][-1:]},
+        'ultimo_trimestre': {**default, 'months': options['months'][-3:]},
+        'uma_categoria': {**default, 'categories': options['categories'][:1]},
+        'sudeste': {**default, 'states': [s for s in options['states'] if s in SOUTHEAST]},
+        'vip': {**default, 'rfm_segments': [s for s in options['rfm_segments'] if s == 'VIP']},
+        'sem_meses': {**default, 'months': []},
+    }
+
+
+# Gera (ou reaproveita) o dataset de uma escala; devolve a pasta e as linhas de cada tabela
+def prepare_dataset(data_dir, scale, seed, workers):
+    path = os.path.join(data_dir, f"scale-{scale:g}-seed-{seed}")
+    info_path = os.path.join(path, DATASET_FILE)
+    if not os.path.exists(info_path):
+        rows = data_generator.generate_dataset(path, scale=scale, seed=seed, workers=workers)
+        with open(info_path, 'w', encoding='utf-8') as f:
+            json.dump({'scale': scale, 'seed': seed, 'rows': rows}, f)
+    with open(info_path, encoding='utf-8') as f:
+        return path, json.load(f)['rows']
+
+
+# Executa uma etapa `repeat` vezes para o tempo e uma vez com tracemalloc para o pico de memória
+def measure(function, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        function()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, {'wall_s': statistics.median(times), 'first_s': times[0], 'peak_mb': peak / 2 ** 20}
+
+
+def prepare_stage(backend_name, path):
+    if backend_name == 'memoria':
+        return lambda: snapshot.build_snapshot(path)
+    return lambda: sql_backend.build_database(path)
+
+
+def run(scales, backends, repeat=3, seed=42, data_dir=DATA_DIR, workers=1, log=print):
+    results = []
+
+    def record(backend_name, scale, stage, selection, rows, metrics):
+        results.append({'backend': backend_name, 'scale': scale, 'stage': stage,
+                        'selection': selection, 'rows': int(rows), **metrics})
+        log(f"{backend_name:8} {scale:>6g}x {stage:9} {selection or '-':17} "
+            f"{metrics['wall_s'] * 1000:10.1f} ms {metrics['peak_mb']:9.1f} MB {int(rows):>12,} linhas")
+
+    for scale in scales:
+        path, dataset_rows = prepare_dataset(data_dir, scale, seed, workers)
+        total_rows = sum(dataset_rows.values())
+        for backend_name in backends:
+            _, metrics = measure(prepare_stage(backend_name, path), 1)
+            record(backend_name, scale, 'preparo', None, total_rows, metrics)
+            backend, metrics = measure(lambda: create_backend(backend_name, path), 1)
+            record(backend_name, scale, 'carga', None, total_rows, metrics)
+            for name, selection in selections(backend.options()).items():
+                rows, metrics = measure(lambda: backend.matching_rows(selection), repeat)
+                record(backend_name, scale, 'filtro', name, rows, metrics)
+                _, metrics = measure(lambda: backend.kpis(selection), repeat)
+                record(backend_name, scale, 'kpis', name, rows, metrics)
+                _, metrics = measure(lambda: backend.visualizations(selection), repeat)
+                record(backend_name, scale, 'graficos', name, rows, metrics)
+            del backend
+    return {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'seed': seed,
+        'repeat': repeat,
+        'results': results,
+    }
+
+
+def _key(result):
+    return (result['backend'], result['scale'], result['stage'], result['selection'])
+
+
+# Etapas mais lentas ou com mais memória que o baseline além da tolerância
+# (diferenças abaixo de min_ms / min_mb são ignoradas como ruído)
+def compare(report, baseline, tolerance=0.25, min_ms=5.0, min_mb=1.0):
+    previous = {_key(r): r for r in baseline['results']}
+    regressions = []
+    for result in report['results']:
+        before = previous.get(_key(result))
+        if before is None:
+            continue
+        for metric, unit, minimum, scale in (('wall_s', 'ms', min_ms, 1000), ('peak_mb', 'MB', min_mb, 1)):
+            old, new = before[metric] * scale, result[metric] * scale
+            if new > old * (1 + tolerance) and new - old > minimum:
+                regressions.append(f"{result['backend']} {result['scale']:g}x {result['stage']} "
+                                   f"{result['selection'] or '-'}: {metric} {old:.1f} -> {new:.1f} {unit} "
+                                   f"(+{(new / old - 1) * 100 if old else float('inf'):.0f}%)")
+    return regressions
+
+
+def _write_json(path, data):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark das etapas do dashboard sem Streamlit.")
+    parser.add_argument("--scales", default="1,10,100", help="fatores de escala separados por vírgula")
+    parser.add_argument("--backends", default=",".join(BACKENDS), help="backends separados por vírgula")
+    parser.add_argument("--repeat", type=int, default=3, help="execuções por etapa de consulta (mediana)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--workers", type=int, default=1, help="processos do gerador de dados")
+    parser.add_argument("--data-dir", default=DATA_DIR, help="pasta dos datasets gerados (reaproveitados entre execuções)")
+    parser.add_argument("--output", default=RESULTS_FILE)
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--update-baseline", action="store_true", help="grava os resultados como novo baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="piora relativa aceita (0.25 = 25%%)")
+    args = parser.parse_args()
+
+    backends = args.backends.split(',')
+    unknown = [b for b in backends if b not in BACKENDS]
+    if unknown:
+        parser.error(f"backend desconhecido: {', '.join(unknown)}")
+    report = run([float(s) for s in args.scales.split(',')], backends, args.repeat, args.seed, args.data_dir, args.workers)
+    _write_json(args.output, report)
+    print(f"Resultados gravados em {args.output}")
+
+    if args.update_baseline:
+        _write_json(args.baseline, report)
+        print(f"Baseline atualizado em {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline, encoding='utf-8') as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} REGRESSÕES em relação a {args.baseline}:")
+            for line in regressions:
+                print(f"  ✗ {line}")
+            sys.exit(1)
+        print(f"Sem regressões em relação a {args.baseline} (tolerância {args.tolerance:.0%}).")
+    else:
+        print(f"Sem baseline em {args.baseline}; use --update-baseline para criar.")
@@ -0,0 +1,84 @@
+# =============================================================================
+# ESQUEMA COMPACTO EM MEMÓRIA E ORÇAMENTO DE MEMÓRIA
+# =============================================================================
+# No modo compacto, as tabelas carregadas pelo backend em memória:
+#   - mantêm só as colunas que o dashboard lê (email, city, registration_date,
+#     brand e price não são carregados);
+#   - guardam inteiros (IDs e quantidades) no menor tipo que comporta os valores;
+#   - codificam como dicionário (category) as strings de baixa cardinalidade e
+#     guardam as demais (nomes) como strings Arrow, sem um objeto Python por valor.
+# Valores monetários continuam float64 para não alterar somas e KPIs.
+# resident_size estima a memória de tabelas e estruturas derivadas (DataFrames e
+# arrays NumPy); o backend relata o tamanho de cada tabela no carregamento e
+# recusa carregar dados além do orçamento configurado (MemoryBudgetError).
+# Partições são recusadas antes de serem lidas, por uma estimativa a partir do
+# número de itens do mês (PARTITION_ROW_BYTES).
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_integer_dtype, is_object_dtype, is_string_dtype
+
+# Colunas que o dashboard lê de cada tabela
+COMPACT_COLUMNS = {
+    'customers': ['customer_id', 'customer_name', 'state'],
+    'products': ['product_id', 'product_name', 'category'],
+    'orders': ['order_id', 'customer_id', 'order_date', 'total_amount', 'status'],
+    'order_items': ['order_item_id', 'order_id', 'product_id', 'quantity', 'unit_price'],
+}
+
+# Strings com menos valores distintos que esta fração das linhas viram category
+LOW_CARDINALITY = 0.5
+
+
+# Bytes por item de pedido de uma partição carregada (pedidos, itens, tabela fato,
+# bitmaps e cubo) nos esquemas completo (False) e compacto (True), com folga sobre
+# o medido nos dados de exemplo; depois da primeira partição vale a média medida
+PARTITION_ROW_BYTES = {False: 150, True: 105}
+
+
+class MemoryBudgetError(MemoryError):
+    pass
+
+
+def compact_table(df, name):
+    df = df[[c for c in COMPACT_COLUMNS[name] if c in df.columns]]
+    columns = {}
+    for col in df.columns:
+        series = df[col]
+        if is_integer_dtype(series.dtype):
+            columns[col] = pd.to_numeric(series, downcast='integer')
+        elif is_object_dtype(series.dtype) or is_string_dtype(series.dtype):
+            if series.nunique() < LOW_CARDINALITY * len(series):
+                columns[col] = series.astype('category')
+            else:
+                columns[col] = series.astype('string[pyarrow]')
+        else:
+            columns[col] = series
+    return pd.DataFrame(columns, index=df.index)
+
+
+# Memória de DataFrames, Series e arrays NumPy, inclusive dentro de dicionários,
+# listas e atributos de objetos (ex.: partições, motor de filtros e cubo)
+def resident_size(obj, _seen=None):
+    seen = set() if _seen is None else _seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    if isinstance(obj, pd.DataFrame):
+        return int(obj.memory_usage(deep=True).sum())
+    if isinstance(obj, (pd.Series, pd.Index)):
+        return int(obj.memory_usage(deep=True))
+    if isinstance(obj, np.ndarray):
+        return obj.nbytes
+    if isinstance(obj, dict):
+        return sum(resident_size(v, seen) for v in obj.values())
+    if isinstance(obj, (list, tuple)):
+        return sum(resident_size(v, seen) for v in obj)
+    if hasattr(obj, '__dict__'):
+        return resident_size(vars(obj), seen)
+    return 0
+
+
+# Tamanhos em MB para o relatório de carregamento
+def format_sizes(sizes):
+    return ', '.join(f"{name} {size / 2 ** 20:.1f} MB" for name, size in sizes.items())
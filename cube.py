@@ -0,0 +1,206 @@
+# =============================================================================
+# CUBO PRÉ-AGREGADO (MÊS x CATEGORIA x ESTADO x STATUS x SEGMENTO RFM)
+# =============================================================================
+# Guarda medidas aditivas por célula, construídas uma única vez a partir da
+# tabela fato:
+#   - células de itens: receita ('revenue') e quantidade de itens ('items');
+#   - células de pedidos: quantidade de pedidos ('orders'). Um pedido pode ter
+#     itens de várias categorias, então no lugar da categoria a célula guarda o
+#     ID do conjunto de categorias do pedido; cada conjunto é um bitmap com um bit
+#     por categoria (linhas de category_sets, que cresce com o número de
+#     categorias). O pedido passa no filtro de categorias quando o conjunto tem
+#     interseção com a seleção, como no filtro original, e a soma continua exata.
+# KPIs e gráficos somam as células da seleção atual: o custo depende do número
+# de células ocupadas (alguns milhares), não do número de pedidos.
+# Clientes únicos não são aditivos: cada célula de itens guarda também um sketch
+# HyperLogLog dos customer_id (ver sketches.py) para o modo aproximado.
+# As células mantêm posição fixa: linhas novas somam nas células existentes ou
+# criam células no fim, sem reconstruir o cubo.
+
+import numpy as np
+import pandas as pd
+
+from filter_engine import DIMENSIONS
+from sketches import DEFAULT_PRECISION, CellSketches
+
+MEASURES = {'revenue': 'items', 'items': 'items', 'orders': 'orders'}
+
+
+class Cube:
+    def __init__(self, fact, sketch_precision=DEFAULT_PRECISION):
+        self.values = {dim: [] for dim in DIMENSIONS}
+        self._positions = {dim: {} for dim in DIMENSIONS}
+        empty = {dim: np.empty(0, dtype=np.int64) for dim in DIMENSIONS}
+        self.items = {'codes': dict(empty), 'revenue': np.zeros(0), 'items': np.zeros(0, dtype=np.int64)}
+        self.orders = {'codes': dict(empty), 'orders': np.zeros(0, dtype=np.int64)}
+        self._cells = {'items': {}, 'orders': {}}
+        self.category_sets = np.zeros((0, 1), dtype=np.uint8)
+        self._category_set_ids = {}
+        self.sketches = CellSketches(sketch_precision)
+        self.add(fact)
+
+    # Códigos de uma coluna. Valores novos entram no fim da lista e os valores
+    # ausentes (ex.: cliente sem segmento RFM) continuam no último slot.
+    def _encode(self, dim, series):
+        values = self.values[dim]
+        positions = self._positions[dim]
+        cat = series.astype('category').cat
+        new_values = [v for v in sorted(cat.categories) if v not in positions]
+        if new_values:
+            old_missing = len(values)
+            for v in new_values:
+                positions[v] = len(values)
+                values.append(v)
+            for name, table in (('items', self.items), ('orders', self.orders)):
+                # Nas células de pedidos a categoria é o ID de um conjunto, não um código
+                if name == 'orders' and dim == 'categories':
+                    continue
+                codes = table['codes'][dim]
+                codes[codes == old_missing] = len(values)
+                self._cells[name] = {key: i for i, key in enumerate(
+                    zip(*(table['codes'][d].tolist() for d in DIMENSIONS)))}
+        lookup = np.array([positions[v] for v in cat.categories] + [len(values)], dtype=np.int64)
+        return lookup[cat.codes.to_numpy()]
+
+    # Posição da célula de cada linha, criando no fim as células que ainda não existem
+    def _locate(self, name, codes):
+        table = getattr(self, name)
+        index = self._cells[name]
+        columns = [codes[dim] for dim in DIMENSIONS]
+        shape = tuple(int(c.max()) + 1 if len(c) else 1 for c in columns)
+        flat, inverse = np.unique(np.ravel_multi_index(columns, shape), return_inverse=True)
+        keys = np.stack(np.unravel_index(flat, shape), axis=1)
+        positions = np.empty(len(keys), dtype=np.int64)
+        new_cells = []
+        for i, key in enumerate(map(tuple, keys.tolist())):
+            if key not in index:
+                index[key] = len(index)
+                new_cells.append(i)
+            positions[i] = index[key]
+        if new_cells:
+            for j, dim in enumerate(DIMENSIONS):
+                table['codes'][dim] = np.concatenate([table['codes'][dim], keys[new_cells, j]])
+            for measure, values in table.items():
+                if measure != 'codes':
+                    table[measure] = np.concatenate([values, np.zeros(len(new_cells), dtype=values.dtype)])
+        return positions[inverse.ravel()]
+
+    # ID do conjunto de categorias de cada pedido; conjuntos novos entram no fim de category_sets.
+    # Categoria ausente (produto sem categoria) não entra no conjunto.
+    def _category_sets_of(self, order_codes, category_codes, n_orders):
+        n_categories = len(self.values['categories'])
+        width = max((n_categories + 7) // 8, 1)
+        if self.category_sets.shape[1] < width:
+            self.category_sets = np.pad(self.category_sets, ((0, 0), (0, width - self.category_sets.shape[1])))
+        known = category_codes < n_categories
+        codes = category_codes[known]
+        bits = np.zeros((n_orders, width), dtype=np.uint8)
+        np.bitwise_or.at(bits, (order_codes[known], codes // 8), (0x80 >> (codes % 8)).astype(np.uint8))
+        unique_sets, inverse = np.unique(bits, axis=0, return_inverse=True)
+        ids = np.empty(len(unique_sets), dtype=np.int64)
+        new_sets = []
+        for i, row in enumerate(unique_sets):
+            key = row.tobytes().rstrip(b'\0')
+            if key not in self._category_set_ids:
+                self._category_set_ids[key] = len(self._category_set_ids)
+                new_sets.append(row)
+            ids[i] = self._category_set_ids[key]
+        if new_sets:
+            self.category_sets = np.concatenate([self.category_sets, np.stack(new_sets)])
+        return ids[inverse.ravel()]
+
+    def _item_codes(self, fact_rows):
+        return {dim: self._encode(dim, fact_rows[col]) for dim, col in DIMENSIONS.items()}
+
+    # Soma (sign=1) ou subtrai (sign=-1) linhas da tabela fato. As linhas devem
+    # trazer todos os itens de cada pedido. Devolve a célula de itens de cada linha.
+    def add(self, fact_rows, sign=1):
+        item_codes = self._item_codes(fact_rows)
+        cells = self._locate('items', item_codes)
+        size = len(self.items['items'])
+        self.items['revenue'] += sign * np.bincount(
+            cells, weights=fact_rows['item_revenue'].to_numpy(dtype=float), minlength=size)
+        self.items['items'] += sign * np.bincount(cells, minlength=size)
+
+        # Conjunto de categorias de cada pedido (OR dos bits das categorias dos itens)
+        _, first_row, order_codes = np.unique(fact_rows['order_id'].to_numpy(), return_index=True, return_inverse=True)
+        codes = {dim: item_codes[dim][first_row] for dim in DIMENSIONS}
+        codes['categories'] = self._category_sets_of(order_codes.ravel(), item_codes['categories'], len(first_row))
+        order_cells = self._locate('orders', codes)
+        self.orders['orders'] += sign * np.bincount(order_cells, minlength=len(self.orders['orders']))
+
+        if sign > 0:
+            self.sketches.add(cells, fact_rows['customer_id'].to_numpy())
+        return cells
+
+    # Atualiza linhas existentes (ex.: clientes que mudaram de segmento RFM).
+    # old_rows são as linhas antes da mudança; fact é a tabela fato já atualizada.
+    def update(self, old_rows, fact, rows):
+        if len(rows) == 0:
+            return
+        cleared = np.unique(self.add(old_rows, sign=-1))
+        self.add(fact.iloc[rows])
+        # Sketches das células que perderam linhas são reconstruídos a partir da tabela fato
+        cells = self._locate('items', self._item_codes(fact))
+        selected = np.isin(cells, cleared)
+        self.sketches.replace(cleared, cells[selected], fact['customer_id'].to_numpy()[selected])
+
+    # Tabela de consulta: quais códigos de uma dimensão passam no filtro (None = sem restrição)
+    def _lookup(self, dim, selected):
+        if dim == 'rfm_segments' and not selected:
+            return None
+        selected = set(selected)
+        values = self.values[dim]
+        lookup = np.zeros(len(values) + 1, dtype=bool)
+        lookup[[i for i, v in enumerate(values) if v in selected]] = True
+        return lookup
+
+    # Células não vazias que passam na seleção
+    def _cell_mask(self, table, selection):
+        codes = table['codes']
+        keep = table['orders' if table is self.orders else 'items'] > 0
+        for dim, selected in selection.items():
+            lookup = self._lookup(dim, selected)
+            if lookup is None:
+                continue
+            if table is self.orders and dim == 'categories':
+                selected = np.packbits(lookup[:-1])
+                selected = np.pad(selected, (0, self.category_sets.shape[1] - len(selected)))
+                keep &= (self.category_sets & selected).any(axis=1)[codes[dim]]
+            else:
+                keep &= lookup[codes[dim]]
+        return keep
+
+    def _labeled(self, dim, totals, present, name):
+        index = pd.Index(np.asarray(self.values[dim], dtype=object)[present], name=DIMENSIONS[dim])
+        return pd.Series(totals[:-1][present], index=index, name=name).sort_index()
+
+    # Total de uma medida para a seleção de filtros
+    def total(self, measure, **selection):
+        table = getattr(self, MEASURES[measure])
+        return table[measure][self._cell_mask(table, selection)].sum()
+
+    # Medida agregada por uma dimensão, apenas com os valores presentes na seleção
+    def rollup(self, measure, dim, **selection):
+        table = getattr(self, MEASURES[measure])
+        keep = self._cell_mask(table, selection)
+        codes = table['codes'][dim][keep]
+        size = len(self.values[dim]) + 1
+        totals = np.bincount(codes, weights=table[measure][keep], minlength=size).astype(table[measure].dtype)
+        present = np.bincount(codes, minlength=size)[:-1] > 0
+        return self._labeled(dim, totals, present, measure)
+
+    # Registradores HLL combinados dos clientes da seleção (para somar cubos de partições diferentes)
+    def customer_registers(self, **selection):
+        return self.sketches.merge(self._cell_mask(self.items, selection))
+
+    # Clientes únicos aproximados (HyperLogLog): total ou por uma dimensão
+    def distinct_customers(self, dim=None, **selection):
+        keep = self._cell_mask(self.items, selection)
+        if dim is None:
+            return int(round(self.sketches.estimate(keep)[0]))
+        codes = self.items['codes'][dim]
+        size = len(self.values[dim]) + 1
+        estimates = np.rint(self.sketches.estimate(keep, codes, size)).astype(np.int64)
+        present = np.bincount(codes[keep], minlength=size)[:-1] > 0
+        return self._labeled(dim, estimates, present, 'customers')
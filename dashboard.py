@@ -11,6 +11,14 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 import os
+import logging
+import threading
+
+from backends import BACKENDS, create_backend, default_selection, selected_backend
+from compact import MemoryBudgetError, format_sizes
+from instrumentation import METRICS, Trace, serve_metrics
+from result_cache import DEFAULT_BUDGET_MB, ResultCache
+from rfm_index import RFMIndex
 
 # Configuração da página
 st.set_page_config(page_title="Dashboard E-commerce", layout="wide")
@@ -19,93 +27,131 @@ st.set_page_config(page_title="Dashboard E-commerce", layout="wide")
 st.title("📊 Dashboard Interativo de E-commerce")
 st.markdown("Análise de vendas, clientes e produtos para 2024")
 
+# Instrumentação (ver instrumentation.py): cada etapa desta execução é medida e registrada
+# no log "dashboard.metrics" (e a memória do backend no carregamento, em "dashboard.memory"); com DASHBOARD_METRICS_PORT definida, os agregados do processo
+# ficam em http://<host>:<porta>/metrics (Prometheus) e, com DASHBOARD_PERFORMANCE=1, o
+# detalhamento desta execução aparece no painel "Performance" ao final da página.
+@st.cache_resource
+def start_instrumentation(port):
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter('%(asctime)s %(name)s %(message)s'))
+    dashboard_logger = logging.getLogger("dashboard")
+    dashboard_logger.addHandler(handler)
+    dashboard_logger.setLevel(logging.INFO)
+    dashboard_logger.propagate = False
+    return serve_metrics(int(port)) if port else None
+
+start_instrumentation(os.environ.get('DASHBOARD_METRICS_PORT'))
+trace = Trace()
+
 # Caminho dos arquivos
 base_dir = "/opt/render/project/src/"
 base_path = os.path.join(base_dir, "Ecommerce_Dataset")  # Ajustado com base no sucesso anterior
-required_files = ['customers.csv', 'products.csv', 'orders.csv', 'order_items.csv', 'rfm_segmentation.csv']
+required_files = ['customers.csv', 'products.csv', 'orders.csv', 'order_items.csv']
 
 if not all(os.path.exists(os.path.join(base_path, f)) for f in required_files):
     st.error(f"Arquivos ausentes em {base_path}: {', '.join(required_files)}. Verifique a estrutura.")
     st.stop()
 
-# Carregar dados com cache
-@st.cache_data
-def load_data():
-    rfm = pd.read_csv(os.path.join(base_path, 'rfm_segmentation.csv'))
-    orders = pd.read_csv(os.path.join(base_path, 'orders.csv'))
-    order_items = pd.read_csv(os.path.join(base_path, 'order_items.csv'))
-    products = pd.read_csv(os.path.join(base_path, 'products.csv'))
-    customers = pd.read_csv(os.path.join(base_path, 'customers.csv'))
-    orders['order_date'] = pd.to_datetime(orders['order_date'])
-    return rfm, orders, order_items, products, customers
+# Backend de dados, escolhido pela variável de ambiente DASHBOARD_BACKEND (ver backends.py):
+#   memoria (padrão): tabela fato, bitmaps e cubo em memória (snapshot colunar ou CSV),
+#                     incorporando os lotes novos de Ecommerce_Dataset/incoming a cada interação;
+#   sqlite: consultas parametrizadas em um banco SQLite com os filtros aplicados no banco.
+# O backend é criado uma vez por processo e compartilhado entre as sessões.
+
+# Resultados das consultas em um cache por processo (ver result_cache.py), chaveado pela
+# versão dos dados e pela seleção de filtros, limitado a DASHBOARD_CACHE_MB de memória
+@st.cache_resource
+def load_results(budget_mb):
+    return ResultCache(budget_mb)
+
+results = load_results(float(os.environ.get('DASHBOARD_CACHE_MB', DEFAULT_BUDGET_MB)))
+
+def cached_result(backend, data_version, query, *args):
+    def compute():
+        METRICS.computed()
+        return getattr(backend, query)(*args)
+    return results.get(data_version, (backend.name, query) + args, compute)
+
+# Calcula os KPIs e gráficos da seleção inicial em segundo plano, ao criar o backend
+def prewarm(backend):
+    selection = default_selection(backend.options())
+    cached_result(backend, backend.version, 'kpis', selection, False)
+    cached_result(backend, backend.version, 'visualizations', selection, False)
+
+@st.cache_resource
+def load_backend(name):
+    METRICS.computed()
+    backend = create_backend(name, base_path)
+    threading.Thread(target=prewarm, args=(backend,), name='cache-prewarm', daemon=True).start()
+    return backend
+
+backend_name = selected_backend()
+if backend_name not in BACKENDS:
+    st.error(f"DASHBOARD_BACKEND inválido: {backend_name}. Use {' ou '.join(BACKENDS)}.")
+    st.stop()
+
+# Dados além do orçamento de memória (no carregamento ou ao carregar uma partição): a página para
+def memory_budget_exceeded(error):
+    st.error(f"Orçamento de memória excedido: {error}. Aumente DASHBOARD_MEMORY_MB ou use DASHBOARD_COMPACT=1.")
+    st.stop()
+
+try:
+    backend = trace.cached('load_backend', load_backend, backend_name)
+    with trace.stage('refresh'):
+        data_version = backend.refresh()
+except MemoryBudgetError as error:
+    memory_budget_exceeded(error)
+except FileNotFoundError as error:  # DASHBOARD_SHARED=1 sem versão publicada pelo carregador
+    st.error(str(error))
+    st.stop()
+with trace.stage('options'):
+    options = backend.options()
+    defaults = default_selection(options)
 
-rfm, orders, order_items, products, customers = load_data()
+for batch, error in backend.rejected.items():
+    st.warning(f"Lote de pedidos '{batch}' rejeitado: {error}")
 
 # Filtros
 st.header("1. Filtros")
 col1, col2, col3, col4, col5 = st.columns(5) #aumentar quantidade de filtros
 
 with col1:
-    months = sorted(orders['order_date'].dt.strftime('%Y-%m').unique().tolist())
-    selected_months = st.multiselect("Meses", months, default=months)
+    months = options['months']
+    selected_months = st.multiselect("Meses", months, default=defaults['months'])
 
 with col2:
-    categories = sorted(products['category'].unique().tolist())
-    selected_categories = st.multiselect("Categorias", categories, default=categories)
+    categories = options['categories']
+    selected_categories = st.multiselect("Categorias", categories, default=defaults['categories'])
 
 with col3:
-    statuses = sorted(orders['status'].unique().tolist())
-    selected_statuses = st.multiselect("Status", statuses, default=['Entregue'])
+    statuses = options['statuses']
+    selected_statuses = st.multiselect("Status", statuses, default=defaults['statuses'])
 
 with col4:
-    states = sorted(customers['state'].unique().tolist())
-    selected_states = st.multiselect("Estados", states, default=states)
+    states = options['states']
+    selected_states = st.multiselect("Estados", states, default=defaults['states'])
 
 with col5:
-    rfm_segments = sorted(rfm['segment'].unique().tolist())
-    selected_rfm_segments = st.multiselect("Segmentos RFM", rfm_segments, default=rfm_segments)
-
-# Filtrar dados dinamicamente
-@st.cache_data
-def filter_data(orders, order_items, products, customers, rfm, months, categories, statuses, states, rfm_segments):
-    filtered_orders = orders[orders['order_date'].dt.strftime('%Y-%m').isin(months) & 
-                           orders['status'].isin(statuses)]
-    filtered_orders = filtered_orders[filtered_orders['customer_id'].isin(
-        customers[customers['state'].isin(states)]['customer_id'])]
-    filtered_order_items = order_items[order_items['order_id'].isin(filtered_orders['order_id'])]
-    filtered_products = products[products['category'].isin(categories)]
-    filtered_order_items = filtered_order_items[filtered_order_items['product_id'].isin(filtered_products['product_id'])]
-    filtered_orders = filtered_orders[filtered_orders['order_id'].isin(filtered_order_items['order_id'])]
-    
-    # Filtrar RFM se aplicável
-    if rfm_segments:
-        filtered_customer_ids = rfm[rfm['segment'].isin(rfm_segments)]['customer_id'].unique()
-        filtered_orders = filtered_orders[filtered_orders['customer_id'].isin(filtered_customer_ids)]
-    
-    return filtered_orders, filtered_order_items, filtered_products
-
-filtered_orders, filtered_order_items, filtered_products = filter_data(
-    orders, order_items, products, customers, rfm, selected_months, selected_categories, selected_statuses, selected_states, selected_rfm_segments
-)
+    rfm_segments = options['rfm_segments']
+    selected_rfm_segments = st.multiselect("Segmentos RFM", rfm_segments, default=defaults['rfm_segments'])
+
+# Modo aproximado: clientes únicos estimados pelos sketches HyperLogLog do cubo (backend em memória)
+approximate_customers = False
+if backend.supports_approximate:
+    approximate_customers = st.toggle("Clientes únicos aproximados (HyperLogLog, erro padrão ≈ 1,6%)", value=False)
+
+selection = dict(months=selected_months, categories=selected_categories, statuses=selected_statuses,
+                 states=selected_states, rfm_segments=selected_rfm_segments)
 
-# KPIs
+# KPIs (resultados em cache por versão dos dados e seleção de filtros)
 st.header("2. KPIs")
-@st.cache_data
-def calculate_kpis(filtered_orders, filtered_order_items, filtered_products):
-    revenue_df = filtered_order_items.merge(filtered_orders, on='order_id') \
-                                    .merge(filtered_products, on='product_id') \
-                                    .assign(item_revenue=lambda x: x['quantity'] * x['unit_price'])
-    total_revenue = revenue_df['item_revenue'].sum()
-    unique_customers = filtered_orders['customer_id'].nunique()
-    total_orders = len(filtered_orders)
-    avg_ticket = total_revenue / total_orders if total_orders > 0 else 0
-    avg_orders_per_customer = total_orders / unique_customers if unique_customers > 0 else 0
-    conversion_rate = (len(filtered_orders[filtered_orders['status'] == 'Entregue']) / len(orders)) * 100 if len(orders) > 0 else 0
-    return total_revenue, unique_customers, total_orders, avg_ticket, avg_orders_per_customer, conversion_rate
-
-total_revenue, unique_customers, total_orders, avg_ticket, avg_orders_per_customer, conversion_rate = calculate_kpis(
-    filtered_orders, filtered_order_items, filtered_products
-)
+try:
+    total_revenue, unique_customers, total_orders, avg_ticket, avg_orders_per_customer, conversion_rate = trace.cached(
+        'calculate_kpis', cached_result, backend, data_version, 'kpis', selection, approximate_customers
+    )
+except MemoryBudgetError as error:
+    memory_budget_exceeded(error)
 
 col1, col2, col3 = st.columns(3)
 col4, col5, col6 = st.columns(3)
@@ -118,204 +164,177 @@ col6.metric("Taxa Conversão", f"{conversion_rate:.2f}%")
 
 # Visualizações
 st.header("3. Visualizações")
-@st.cache_data
-def get_visualizations(orders, order_items, products, filtered_orders, filtered_order_items, filtered_products, customers, rfm):
-    # Top 5 Produtos (usando dados brutos para todas as categorias)
-    top_products = order_items.merge(orders, on='order_id') \
-                             .merge(products, on='product_id') \
-                             .assign(item_revenue=lambda x: x['quantity'] * x['unit_price']) \
-                             .groupby(['product_name', 'category']) \
-                             .agg({'item_revenue': 'sum'}) \
-                             .reset_index() \
-                             .rename(columns={'item_revenue': 'total_revenue'}) \
-                             .sort_values('total_revenue', ascending=False) \
-                             .head(5)
-
-    # Receita por Categoria (com filtros)
-    revenue_by_category = filtered_order_items.merge(filtered_orders, on='order_id') \
-                                             .merge(filtered_products, on='product_id') \
-                                             .assign(item_revenue=lambda x: x['quantity'] * x['unit_price']) \
-                                             .groupby('category') \
-                                             .agg({'item_revenue': 'sum'}) \
-                                             .reset_index() \
-                                             .rename(columns={'item_revenue': 'total_revenue'})
-
-    # Receita por Estado (com filtros)
-    revenue_by_state = filtered_orders.merge(filtered_order_items, on='order_id') \
-                                     .merge(filtered_products, on='product_id') \
-                                     .merge(customers, on='customer_id') \
-                                     .assign(item_revenue=lambda x: x['quantity'] * x['unit_price']) \
-                                     .groupby('state') \
-                                     .agg({'item_revenue': 'sum'}) \
-                                     .reset_index() \
-                                     .rename(columns={'item_revenue': 'total_revenue'})
-
-    # Receita Mensal (com filtros)
-    revenue_monthly = filtered_orders.merge(filtered_order_items, on='order_id') \
-                                    .merge(filtered_products, on='product_id') \
-                                    .assign(item_revenue=lambda x: x['quantity'] * x['unit_price']) \
-                                    .groupby(filtered_orders['order_date'].dt.strftime('%Y-%m')) \
-                                    .agg({'item_revenue': 'sum'}) \
-                                    .reset_index() \
-                                    .rename(columns={'item_revenue': 'total_amount', 'order_date': 'order_date'})
-
-    # Status de Pedidos (com filtros)
-    status_counts = filtered_orders['status'].value_counts().reset_index()
-    status_counts.columns = ['status', 'count']
-
-    # Clientes Únicos por Mês (com filtros)
-    monthly_customers = filtered_orders.groupby(filtered_orders['order_date'].dt.strftime('%Y-%m'))['customer_id'] \
-                                      .nunique().reset_index(name='unique_customers')
-
-    # Pedidos Totais por Mês (com filtros)
-    total_orders_by_month = filtered_orders.groupby(filtered_orders['order_date'].dt.strftime('%Y-%m')) \
-                                          .size().reset_index(name='total_orders')
-
-    return top_products, revenue_by_category, revenue_by_state, revenue_monthly, status_counts, monthly_customers, total_orders_by_month
-
-top_products, revenue_by_category, revenue_by_state, revenue_monthly, status_counts, monthly_customers, total_orders_by_month = get_visualizations(
-    orders, order_items, products, filtered_orders, filtered_order_items, filtered_products, customers, rfm
+top_products, revenue_by_category, revenue_by_state, revenue_monthly, status_counts, monthly_customers, total_orders_by_month, clientes_categoria = trace.cached(
+    'get_visualizations', cached_result, backend, data_version, 'visualizations', selection, approximate_customers,
+    rows_out=lambda frames: sum(len(frame) for frame in frames)
 )
 
-# Gráficos
-# 3.1. Top 5 Produtos
-st.subheader("Top 5 Produtos por Receita")
-if not top_products.empty:
-    fig_top = px.bar(top_products, x='product_name', y='total_revenue', color='category',
-                     title="Top 5 Produtos por Receita")
-    fig_top.update_layout(xaxis_title="Produto", yaxis_title="Receita (R$)", xaxis_tickangle=45)
-    st.plotly_chart(fig_top, use_container_width=True)
-else:
-    st.warning("Nenhum dado disponível.")
-
-# 3.2. Receita por Categoria
-st.subheader("Receita por Categoria")
-if not revenue_by_category.empty:
-    fig_cat = px.bar(revenue_by_category, x='category', y='total_revenue',
-                     title="Receita por Categoria")
-    fig_cat.update_layout(xaxis_title="Categoria", yaxis_title="Receita (R$)")
-    st.plotly_chart(fig_cat, use_container_width=True)
-else:
-    st.warning("Nenhum dado disponível.")
-
-# 3.3. Receita por Estado
-st.subheader("Receita por Estado")
-if not revenue_by_state.empty:
-    fig_state = px.bar(revenue_by_state, x='state', y='total_revenue',
-                       title="Receita por Estado")
-    fig_state.update_layout(xaxis_title="Estado", yaxis_title="Receita (R$)", xaxis_tickangle=45)
-    st.plotly_chart(fig_state, use_container_width=True)
-else:
-    st.warning("Nenhum dado disponível.")
-
-# 3.4. Tendência de Receita Mensal
-st.subheader("Tendência de Receita Mensal")
-if not revenue_monthly.empty:
-    fig_month = px.line(revenue_monthly, x='order_date', y='total_amount',
-                        title="Receita Mensal (2024)", markers=True)
-    fig_month.update_layout(xaxis_title="Mês", yaxis_title="Receita (R$)")
-    st.plotly_chart(fig_month, use_container_width=True)
-else:
-    st.warning("Nenhum dado disponível.")
-
-# ============================================================
-# Receita: Mês Atual vs Mês Anterior
-# ============================================================
-st.subheader("Receita: Mês Atual vs Mês Anterior")
-if not revenue_monthly.empty and len(revenue_monthly) >= 2:
-    current_month = revenue_monthly.iloc[-1]
-    previous_month = revenue_monthly.iloc[-2]
-    delta = current_month['total_amount'] - previous_month['total_amount']
-    percent = (delta / previous_month['total_amount']) * 100 if previous_month['total_amount'] > 0 else 0
-    colA, colB = st.columns(2)
-    colA.metric("Receita Mês Atual", f"R$ {current_month['total_amount']:,.2f}", f"{percent:.2f}%", delta_color="normal")
-    colB.metric("Receita Mês Anterior", f"R$ {previous_month['total_amount']:,.2f}")
-else:
-    st.info("Dados insuficientes para comparação entre meses.")
-
-# 3.5. Distribuição de Status
-st.subheader("Distribuição de Status de Pedidos")
-if not status_counts.empty:
-    fig_status = px.pie(status_counts, names='status', values='count',
-                        title="Distribuição de Status")
-    st.plotly_chart(fig_status, use_container_width=True)
-else:
-    st.warning("Nenhum dado disponível.")
-
-# 3.6. Clientes Únicos por Mês
-st.subheader("Clientes Únicos por Mês")
-if not monthly_customers.empty:
-    fig_cust = px.line(monthly_customers, x='order_date', y='unique_customers',
-                       title="Clientes Únicos por Mês", markers=True)
-    fig_cust.update_layout(xaxis_title="Mês", yaxis_title="Clientes Únicos")
-    st.plotly_chart(fig_cust, use_container_width=True)
-else:
-    st.warning("Nenhum dado disponível.")
-
-# 3.7. Pedidos Totais por Mês
-st.subheader("Pedidos Totais por Mês")
-if not total_orders_by_month.empty:
-    fig_orders = px.line(total_orders_by_month, x='order_date', y='total_orders',
-                         title="Pedidos Totais por Mês", markers=True)
-    fig_orders.update_layout(xaxis_title="Mês", yaxis_title="Total Pedidos")
-    st.plotly_chart(fig_orders, use_container_width=True)
-else:
-    st.warning("Nenhum dado disponível.")
-
-# 3.8. Segmentos RFM
-st.subheader("Distribuição de Segmentos RFM")
-if not rfm.empty:
-    fig_rfm = px.histogram(rfm, x='segment', category_orders={"segment": ["VIP", "Regular", "Ocasional", "Inativo"]},
-                           title="Segmentação de Clientes")
-    fig_rfm.update_layout(xaxis_title="Segmento", yaxis_title="Contagem")
-    st.plotly_chart(fig_rfm, use_container_width=True)
-else:
-    st.warning("Nenhum dado disponível.")
-
-# ============================================================
-# Distribuição de Clientes por Região (Estado)
-# ============================================================
-st.subheader("Distribuição de Clientes por Região (Estado)")
-clientes_por_estado = customers['state'].value_counts().reset_index()
-clientes_por_estado.columns = ['state', 'count']
-fig_clients_state = px.bar(clientes_por_estado, x='state', y='count',
-                           title="Clientes por Estado",
-                           labels={'state': 'Estado', 'count': 'Número de Clientes'})
-st.plotly_chart(fig_clients_state, use_container_width=True)
-
-# ============================================================
-# Novos Clientes por Mês
-# ============================================================
-st.subheader("Novos Clientes por Mês")
-first_orders = orders.sort_values('order_date').drop_duplicates('customer_id', keep='first')
-new_customers_monthly = first_orders.groupby(first_orders['order_date'].dt.strftime('%Y-%m'))['customer_id'].nunique().reset_index()
-new_customers_monthly.columns = ['month', 'new_customers']
-fig_new_customers = px.line(new_customers_monthly, x='month', y='new_customers', markers=True,
-                            title="Novos Clientes por Mês")
-fig_new_customers.update_layout(xaxis_title="Mês", yaxis_title="Novos Clientes")
-st.plotly_chart(fig_new_customers, use_container_width=True)
-
-# ============================================================
-# Clientes por Categoria
-# ============================================================
-st.subheader("Clientes por Categoria")
-clientes_categoria = order_items.merge(orders, on='order_id') \
-                                 .merge(products, on='product_id') \
-                                 .groupby('category')['customer_id'] \
-                                 .nunique().reset_index(name='unique_customers')
-fig_clientes_cat = px.bar(clientes_categoria, x='category', y='unique_customers',
-                          title="Clientes por Categoria",
-                          labels={'category': 'Categoria', 'unique_customers': 'Clientes Únicos'})
-st.plotly_chart(fig_clientes_cat, use_container_width=True)
-
-
-# 3.9. Imagens estáticas
-st.subheader("Visualizações Estáticas")
-try:
-    st.image(os.path.join(base_path, 'price_distribution_by_category.png'), caption="Preços por Categoria")
-    st.image(os.path.join(base_path, 'rfm_segment_distribution.png'), caption="Segmentos RFM")
-except FileNotFoundError:
-    st.warning(f"Imagens não encontradas em {base_path}")
+with trace.stage('rfm_table') as stage:
+    rfm = backend.rfm_table()
+    stage.rows(rows_out=len(rfm))
+
+# Gráficos, agrupados em seções: só a seção escolhida monta e envia seus gráficos
+def revenue_charts(trace):
+    # 3.1. Top 5 Produtos
+    st.subheader("Top 5 Produtos por Receita")
+    with trace.stage('grafico_top_produtos', rows_in=len(top_products)):
+        if not top_products.empty:
+            fig_top = px.bar(top_products, x='product_name', y='total_revenue', color='category',
+                             title="Top 5 Produtos por Receita")
+            fig_top.update_layout(xaxis_title="Produto", yaxis_title="Receita (R$)", xaxis_tickangle=45)
+            st.plotly_chart(fig_top, use_container_width=True)
+        else:
+            st.warning("Nenhum dado disponível.")
+
+    # 3.2. Receita por Categoria
+    st.subheader("Receita por Categoria")
+    with trace.stage('grafico_receita_categoria', rows_in=len(revenue_by_category)):
+        if not revenue_by_category.empty:
+            fig_cat = px.bar(revenue_by_category, x='category', y='total_revenue',
+                             title="Receita por Categoria")
+            fig_cat.update_layout(xaxis_title="Categoria", yaxis_title="Receita (R$)")
+            st.plotly_chart(fig_cat, use_container_width=True)
+        else:
+            st.warning("Nenhum dado disponível.")
+
+    # 3.3. Receita por Estado
+    st.subheader("Receita por Estado")
+    with trace.stage('grafico_receita_estado', rows_in=len(revenue_by_state)):
+        if not revenue_by_state.empty:
+            fig_state = px.bar(revenue_by_state, x='state', y='total_revenue',
+                               title="Receita por Estado")
+            fig_state.update_layout(xaxis_title="Estado", yaxis_title="Receita (R$)", xaxis_tickangle=45)
+            st.plotly_chart(fig_state, use_container_width=True)
+        else:
+            st.warning("Nenhum dado disponível.")
+
+    # 3.4. Tendência de Receita Mensal
+    st.subheader("Tendência de Receita Mensal")
+    with trace.stage('grafico_receita_mensal', rows_in=len(revenue_monthly)):
+        if not revenue_monthly.empty:
+            fig_month = px.line(revenue_monthly, x='order_date', y='total_amount',
+                                title="Receita Mensal (2024)", markers=True)
+            fig_month.update_layout(xaxis_title="Mês", yaxis_title="Receita (R$)")
+            st.plotly_chart(fig_month, use_container_width=True)
+        else:
+            st.warning("Nenhum dado disponível.")
+
+    # ============================================================
+    # Receita: Mês Atual vs Mês Anterior
+    # ============================================================
+    st.subheader("Receita: Mês Atual vs Mês Anterior")
+    with trace.stage('comparacao_mensal', rows_in=len(revenue_monthly)):
+        if not revenue_monthly.empty and len(revenue_monthly) >= 2:
+            current_month = revenue_monthly.iloc[-1]
+            previous_month = revenue_monthly.iloc[-2]
+            delta = current_month['total_amount'] - previous_month['total_amount']
+            percent = (delta / previous_month['total_amount']) * 100 if previous_month['total_amount'] > 0 else 0
+            colA, colB = st.columns(2)
+            colA.metric("Receita Mês Atual", f"R$ {current_month['total_amount']:,.2f}", f"{percent:.2f}%", delta_color="normal")
+            colB.metric("Receita Mês Anterior", f"R$ {previous_month['total_amount']:,.2f}")
+        else:
+            st.info("Dados insuficientes para comparação entre meses.")
+
+def order_charts(trace):
+    # 3.5. Distribuição de Status
+    st.subheader("Distribuição de Status de Pedidos")
+    with trace.stage('grafico_status', rows_in=len(status_counts)):
+        if not status_counts.empty:
+            fig_status = px.pie(status_counts, names='status', values='count',
+                                title="Distribuição de Status")
+            st.plotly_chart(fig_status, use_container_width=True)
+        else:
+            st.warning("Nenhum dado disponível.")
+
+    # 3.6. Clientes Únicos por Mês
+    st.subheader("Clientes Únicos por Mês")
+    with trace.stage('grafico_clientes_mes', rows_in=len(monthly_customers)):
+        if not monthly_customers.empty:
+            fig_cust = px.line(monthly_customers, x='order_date', y='unique_customers',
+                               title="Clientes Únicos por Mês", markers=True)
+            fig_cust.update_layout(xaxis_title="Mês", yaxis_title="Clientes Únicos")
+            st.plotly_chart(fig_cust, use_container_width=True)
+        else:
+            st.warning("Nenhum dado disponível.")
+
+    # 3.7. Pedidos Totais por Mês
+    st.subheader("Pedidos Totais por Mês")
+    with trace.stage('grafico_pedidos_mes', rows_in=len(total_orders_by_month)):
+        if not total_orders_by_month.empty:
+            fig_orders = px.line(total_orders_by_month, x='order_date', y='total_orders',
+                                 title="Pedidos Totais por Mês", markers=True)
+            fig_orders.update_layout(xaxis_title="Mês", yaxis_title="Total Pedidos")
+            st.plotly_chart(fig_orders, use_container_width=True)
+        else:
+            st.warning("Nenhum dado disponível.")
+
+def customer_charts(trace):
+    # 3.8. Segmentos RFM
+    st.subheader("Distribuição de Segmentos RFM")
+    with trace.stage('grafico_rfm', rows_in=len(rfm)):
+        if not rfm.empty:
+            fig_rfm = px.histogram(rfm, x='segment', category_orders={"segment": ["VIP", "Regular", "Ocasional", "Inativo"]},
+                                   title="Segmentação de Clientes")
+            fig_rfm.update_layout(xaxis_title="Segmento", yaxis_title="Contagem")
+            st.plotly_chart(fig_rfm, use_container_width=True)
+        else:
+            st.warning("Nenhum dado disponível.")
+
+    # ============================================================
+    # Distribuição de Clientes por Região (Estado)
+    # ============================================================
+    st.subheader("Distribuição de Clientes por Região (Estado)")
+    with trace.stage('grafico_clientes_estado') as stage:
+        clientes_por_estado = backend.customers_by_state()
+        stage.rows(rows_in=len(clientes_por_estado))
+        fig_clients_state = px.bar(clientes_por_estado, x='state', y='count',
+                                   title="Clientes por Estado",
+                                   labels={'state': 'Estado', 'count': 'Número de Clientes'})
+        st.plotly_chart(fig_clients_state, use_container_width=True)
+
+    # ============================================================
+    # Novos Clientes por Mês
+    # ============================================================
+    st.subheader("Novos Clientes por Mês")
+    with trace.stage('grafico_novos_clientes') as stage:
+        new_customers_monthly = backend.new_customers_monthly()
+        stage.rows(rows_in=len(new_customers_monthly))
+        fig_new_customers = px.line(new_customers_monthly, x='month', y='new_customers', markers=True,
+                                    title="Novos Clientes por Mês")
+        fig_new_customers.update_layout(xaxis_title="Mês", yaxis_title="Novos Clientes")
+        st.plotly_chart(fig_new_customers, use_container_width=True)
+
+    # ============================================================
+    # Clientes por Categoria
+    # ============================================================
+    st.subheader("Clientes por Categoria")
+    with trace.stage('grafico_clientes_categoria', rows_in=len(clientes_categoria)):
+        fig_clientes_cat = px.bar(clientes_categoria, x='category', y='unique_customers',
+                                  title="Clientes por Categoria",
+                                  labels={'category': 'Categoria', 'unique_customers': 'Clientes Únicos'})
+        st.plotly_chart(fig_clientes_cat, use_container_width=True)
+
+def static_images(trace):
+    # 3.9. Imagens estáticas
+    st.subheader("Visualizações Estáticas")
+    with trace.stage('imagens_estaticas'):
+        try:
+            st.image(os.path.join(base_path, 'price_distribution_by_category.png'), caption="Preços por Categoria")
+            st.image(os.path.join(base_path, 'rfm_segment_distribution.png'), caption="Segmentos RFM")
+        except FileNotFoundError:
+            st.warning(f"Imagens não encontradas em {base_path}")
+
+CHART_SECTIONS = {"Receita": revenue_charts, "Pedidos": order_charts,
+                  "Clientes e Segmentos": customer_charts, "Imagens Estáticas": static_images}
+
+# Trocar de seção reexecuta só este fragmento, sem recalcular filtros, KPIs e a tabela RFM
+@st.experimental_fragment
+def chart_sections(parent):
+    section = st.radio("Seção", list(CHART_SECTIONS), horizontal=True, key="secao_graficos")
+    with parent.fragment('fragmento_graficos') as trace:
+        CHART_SECTIONS[section](trace)
+
+chart_sections(trace)
 
 # Relatório Resumo
 st.header("Resumo dos Resultados")
@@ -360,29 +379,99 @@ st.markdown(f"""
 - **Recomendações**: Focar em campanhas de retenção para os {inativo_percentage:.1f}% de clientes Inativos, maximizar vendas em novembro com promoções sazonais e explorar o potencial de crescimento em estados com menor participação.
 """)
 
-# Visualização da tabela rfm_segmentation.csv com filtros
+# Visualização da tabela de segmentação RFM com filtros
 st.header("Tabela de Segmentação RFM")
-# Filtros para recency, frequency e monetary
-min_recency = int(rfm['recency'].min())
-max_recency = int(rfm['recency'].max())
-min_frequency = int(rfm['frequency'].min())
-max_frequency = int(rfm['frequency'].max())
-min_monetary = int(rfm['monetary'].min())
-max_monetary = int(rfm['monetary'].max())
-
-recency_range = st.slider("Recency (dias)", min_recency, max_recency, (min_recency, max_recency))
-frequency_range = st.slider("Frequency (pedidos)", min_frequency, max_frequency, (min_frequency, max_frequency))
-monetary_range = st.slider("Monetary (R$)", min_monetary, max_monetary, (min_monetary, max_monetary))
-
-# Filtrar a tabela com base nos sliders
-filtered_rfm = rfm[
-    (rfm['recency'] >= recency_range[0]) & (rfm['recency'] <= recency_range[1]) &
-    (rfm['frequency'] >= frequency_range[0]) & (rfm['frequency'] <= frequency_range[1]) &
-    (rfm['monetary'] >= monetary_range[0]) & (rfm['monetary'] <= monetary_range[1])
-]
-
-# Exibir a tabela
-st.dataframe(filtered_rfm)
+
+# Índice da tabela RFM (ver rfm_index.py), guardado no cache de resultados junto com as consultas
+def rfm_index(backend, data_version, *population):
+    def compute():
+        METRICS.computed()
+        if population:
+            return RFMIndex(cached_result(backend, data_version, 'segment_population', *population))
+        return RFMIndex(backend.rfm_table())
+    return results.get(data_version, (backend.name, 'rfm_index') + population, compute)
+
+# Tabela paginada no servidor: filtros, busca e ordenação consultam o índice e só a página
+# escolhida é enviada ao navegador
+def rfm_table_section(trace):
+    # RFM recalculado só com os pedidos dos meses e estados selecionados (mesma data de referência)
+    population = ()
+    if st.toggle("Segmentar apenas a população filtrada (meses e estados selecionados)", value=False):
+        population = (selected_months, selected_states)
+    index = trace.cached('rfm_index', rfm_index, backend, data_version, *population, rows_out=len)
+    rfm_table = index.rfm
+
+    if rfm_table.empty:
+        st.warning("Nenhum cliente com pedidos entregues na seleção.")
+    else:
+        # Filtros para recency, frequency e monetary
+        min_recency, max_recency = map(int, index.bounds('recency'))
+        min_frequency, max_frequency = map(int, index.bounds('frequency'))
+        min_monetary, max_monetary = map(int, index.bounds('monetary'))
+
+        recency_range = st.slider("Recency (dias)", min_recency, max_recency, (min_recency, max_recency))
+        frequency_range = st.slider("Frequency (pedidos)", min_frequency, max_frequency, (min_frequency, max_frequency))
+        monetary_range = st.slider("Monetary (R$)", min_monetary, max_monetary, (min_monetary, max_monetary))
+
+        # Busca por nome, ordenação e tamanho da página
+        col_search, col_sort, col_order, col_size = st.columns([3, 2, 1, 1])
+        search = col_search.text_input("Buscar cliente (nome)", key="busca_rfm")
+        sort_by = col_sort.selectbox("Ordenar por", ["(ordem original)"] + list(rfm_table.columns), key="ordem_rfm")
+        ascending = col_order.toggle("Crescente", value=True, key="crescente_rfm")
+        page_size = col_size.selectbox("Linhas por página", [25, 50, 100, 500], index=1, key="tamanho_pagina_rfm")
+
+        # Filtrar a tabela com base nos sliders e na busca
+        with trace.stage('filtro_rfm', rows_in=len(rfm_table)) as stage:
+            positions = index.query({'recency': recency_range, 'frequency': frequency_range, 'monetary': monetary_range},
+                                    search, None if sort_by == "(ordem original)" else sort_by, ascending)
+            stage.rows(rows_out=len(positions))
+
+        # Volta para a última página quando o resultado diminui
+        pages = max(1, -(-len(positions) // page_size))
+        if st.session_state.get('pagina_rfm', 1) > pages:
+            st.session_state['pagina_rfm'] = pages
+        page = st.number_input("Página", min_value=1, max_value=pages, step=1, key="pagina_rfm")
+        st.caption(f"{len(positions):,} clientes; página {page} de {pages}")
+
+        # Exibir a página da tabela
+        with trace.stage('tabela_rfm', rows_in=len(positions)) as stage:
+            page_rows = index.page(positions, page, page_size)
+            stage.rows(rows_out=len(page_rows))
+            st.dataframe(page_rows)
+
+        # CSV do resultado filtrado completo, montado em blocos só quando pedido
+        if st.button("Preparar CSV do resultado filtrado"):
+            with trace.stage('exportacao_rfm', rows_in=len(positions)):
+                st.download_button("Baixar CSV", ''.join(index.csv_chunks(positions)),
+                                   file_name="segmentacao_rfm.csv", mime="text/csv")
+
+# A tabela e seus controles formam um fragmento: mexer nos sliders ou no toggle reexecuta só esta seção
+@st.experimental_fragment
+def rfm_table_fragment(parent):
+    with parent.fragment('fragmento_tabela_rfm') as trace:
+        rfm_table_section(trace)
+
+rfm_table_fragment(trace)
 
 st.markdown("---")
 st.markdown("Dashboard otimizado, 20/07/2025")
+
+# Painel de desempenho desta execução (DASHBOARD_PERFORMANCE=1)
+breakdown = trace.finish()
+if os.environ.get('DASHBOARD_PERFORMANCE') == '1':
+    with st.expander("Performance", expanded=False):
+        stages = pd.DataFrame(breakdown)
+        stages['memory_mb'] = pd.to_numeric(stages.pop('memory_bytes')) / 2 ** 20
+        st.caption(f"Execução em {sum(s['seconds'] for s in breakdown):.3f} s medidos em {len(breakdown)} etapas "
+                   f"(backend: {backend.name}, versão dos dados: {data_version})")
+        st.dataframe(stages, hide_index=True, use_container_width=True)
+        hit_rates = {name: METRICS.hit_rate(name) for name in METRICS.caches}
+        st.caption("Taxa de acerto do cache no processo: " +
+                   ", ".join(f"{name} {rate:.0%}" for name, rate in hit_rates.items() if rate is not None))
+        cache_stats = results.stats()
+        st.caption(f"Cache de resultados: {cache_stats['entries']} resultados, "
+                   f"{cache_stats['bytes'] / 2 ** 20:.1f} de {cache_stats['budget_bytes'] / 2 ** 20:.0f} MB, "
+                   f"{cache_stats['evictions']} descartes")
+        memory = backend.memory_usage()
+        if memory:
+            st.caption(f"Memória dos dados ({sum(memory.values()) / 2 ** 20:.1f} MB): {format_sizes(memory)}")
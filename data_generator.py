@@ -0,0 +1,268 @@
+# =============================================================================
+# GERADOR DE DADOS SINTÉTICOS (VETORIZADO E EM BLOCOS)
+# =============================================================================
+# Versão em módulo/CLI do gerador do notebook "1 - Gerador_de_dados.ipynb", com as
+# mesmas distribuições: meses com peso sazonal, status (85% entregue, 10%
+# processando, 5% cancelado), 1 a 5 itens por pedido sem repetir produto,
+# quantidades de 1 a 3 e preço unitário entre 80% e 105% do preço do produto.
+# Todos os sorteios são feitos em lote com NumPy. Clientes e pedidos são gerados
+# em blocos de tamanho fixo, cada bloco com a sua própria semente (derivada de
+# seed e do número do bloco), e gravados em sequência em CSV ou Feather (Arrow IPC);
+# os blocos podem ser gerados em processos paralelos. A saída é a mesma para a
+# mesma seed, escala e tamanho de bloco, com qualquer número de processos.
+# Nomes, e-mails, cidades e palavras vêm de conjuntos gerados pelo Faker (pt_BR)
+# e sorteados pelo NumPy. A escala multiplica clientes (10.000) e pedidos (50.000);
+# o catálogo continua com 500 produtos.
+# Uso: python data_generator.py DESTINO [--scale 10] [--seed 42] [--format csv|feather]
+#                               [--chunk-size 1000000] [--workers 4]
+
+import argparse
+import calendar
+import os
+import shutil
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from faker import Faker
+from faker.providers.address.pt_BR import Provider as AddressProvider
+
+BASE_CUSTOMERS = 10_000
+BASE_PRODUCTS = 500
+BASE_ORDERS = 50_000
+DEFAULT_CHUNK_SIZE = 1_000_000
+POOL_SIZE = 10_000
+
+ORDER_YEAR = 2024
+REGISTRATION_START = np.datetime64('2023-01-01')
+REGISTRATION_END = np.datetime64('2024-12-31')
+
+CATEGORIES = ['Eletrônicos', 'Casa & Jardim', 'Esportes', 'Moda', 'Livros']
+BRANDS = ['Samsung', 'Apple', 'Sony', 'LG', 'Philips', 'Nike', 'Adidas', 'Zara',
+          'H&M', 'Generic', 'Premium', 'Basic', 'Pro', 'Elite', 'Standard']
+PRICE_RANGES = {
+    'Eletrônicos': (100, 3000),
+    'Casa & Jardim': (20, 800),
+    'Esportes': (30, 500),
+    'Moda': (25, 300),
+    'Livros': (15, 120),
+}
+PRODUCT_NAMES = {
+    'Eletrônicos': ['Smartphone', 'Laptop', 'Tablet', 'Fone de Ouvido', 'TV', 'Câmera'],
+    'Casa & Jardim': ['Sofá', 'Mesa', 'Luminária', 'Vaso', 'Tapete', 'Espelho'],
+    'Esportes': ['Tênis', 'Camisa', 'Bola', 'Raquete', 'Bicicleta', 'Mochila'],
+    'Moda': ['Camiseta', 'Calça', 'Vestido', 'Sapato', 'Bolsa', 'Óculos'],
+    'Livros': ['Romance', 'Ficção', 'Técnico', 'Biografia', 'Infantil', 'Autoajuda'],
+}
+SEASONAL_WEIGHTS = [0.8, 0.7, 0.8, 0.9, 1.0, 0.9, 0.9, 0.8, 0.9, 1.1, 1.4, 1.3]
+STATUSES, STATUS_P = ['Entregue', 'Processando', 'Cancelado'], [0.85, 0.10, 0.05]
+ITEM_COUNTS, ITEM_COUNT_P = [1, 2, 3, 4, 5], [0.4, 0.3, 0.2, 0.08, 0.02]
+QUANTITIES, QUANTITY_P = [1, 2, 3], [0.7, 0.25, 0.05]
+PRICE_JITTER = (0.8, 1.05)
+
+# Fluxos de números aleatórios independentes (combinados com a seed e o bloco)
+_CUSTOMERS, _PRODUCTS, _ITEM_COUNTS, _ORDERS = range(4)
+
+
+def _rng(seed, stream, chunk=0):
+    return np.random.default_rng([seed, stream, chunk])
+
+
+# Conjuntos de valores do Faker sorteados pelos geradores vetorizados
+def faker_pools(seed, size=POOL_SIZE):
+    Faker.seed(seed)
+    fake = Faker('pt_BR')
+    return {
+        'names': np.array([fake.name() for _ in range(size)], dtype=object),
+        'emails': np.array([fake.email() for _ in range(size)], dtype=object),
+        'cities': np.array([fake.city() for _ in range(size)], dtype=object),
+        'words': np.array([fake.word().title() for _ in range(size)], dtype=object),
+        'states': np.array([abbr for abbr, _ in AddressProvider.estados], dtype=object),
+    }
+
+
+def generate_customers(seed, chunk, first_id, n, pools):
+    rng = _rng(seed, _CUSTOMERS, chunk)
+    days = (REGISTRATION_END - REGISTRATION_START).astype(int)
+    return pd.DataFrame({
+        'customer_id': np.arange(first_id, first_id + n),
+        'customer_name': rng.choice(pools['names'], n),
+        'email': rng.choice(pools['emails'], n),
+        'registration_date': REGISTRATION_START + rng.integers(0, days + 1, n),
+        'city': rng.choice(pools['cities'], n),
+        'state': rng.choice(pools['states'], n),
+    })
+
+
+def generate_products(seed, pools, n=BASE_PRODUCTS):
+    rng = _rng(seed, _PRODUCTS)
+    category = rng.integers(len(CATEGORIES), size=n)
+    brand = np.asarray(BRANDS, dtype=object)[rng.integers(len(BRANDS), size=n)]
+    low, high = np.array([PRICE_RANGES[c] for c in CATEGORIES], dtype=float).T
+    price = np.round(rng.uniform(low[category], high[category]), 2)
+    names = np.array([PRODUCT_NAMES[c] for c in CATEGORIES], dtype=object)
+    base_name = names[category, rng.integers(names.shape[1], size=n)]
+    word = rng.choice(pools['words'], n)
+    return pd.DataFrame({
+        'product_id': np.arange(1, n + 1),
+        'product_name': brand + ' ' + base_name + ' ' + word,
+        'category': np.asarray(CATEGORIES, dtype=object)[category],
+        'price': price,
+        'brand': brand,
+    })
+
+
+# Quantidade de itens de cada pedido de um bloco (fluxo próprio, para que o processo
+# principal conheça o número de itens de cada bloco sem gerar os pedidos)
+def item_counts(seed, chunk, n):
+    return _rng(seed, _ITEM_COUNTS, chunk).choice(ITEM_COUNTS, size=n, p=ITEM_COUNT_P)
+
+
+# Produtos dos itens, sem repetição dentro do mesmo pedido (sorteia de novo só os repetidos)
+def _distinct_products(rng, order_index, n_products):
+    products = rng.integers(1, n_products + 1, size=len(order_index))
+    while True:
+        order = np.lexsort((products, order_index))
+        same_order = order_index[order][1:] == order_index[order][:-1]
+        repeated = order[1:][same_order & (products[order][1:] == products[order][:-1])]
+        if len(repeated) == 0:
+            return products
+        products[repeated] = rng.integers(1, n_products + 1, size=len(repeated))
+
+
+def generate_orders(seed, chunk, first_order_id, first_item_id, n, n_customers, prices):
+    rng = _rng(seed, _ORDERS, chunk)
+    weights = np.asarray(SEASONAL_WEIGHTS) / sum(SEASONAL_WEIGHTS)
+    month = rng.choice(12, size=n, p=weights)
+    month_start = np.array([f"{ORDER_YEAR}-{m:02d}-01" for m in range(1, 13)], dtype='datetime64[D]')
+    days_in_month = np.array([calendar.monthrange(ORDER_YEAR, m)[1] for m in range(1, 13)])
+    order_date = month_start[month] + rng.integers(0, days_in_month[month])
+    customer_id = rng.integers(1, n_customers + 1, size=n)
+    status = np.asarray(STATUSES, dtype=object)[rng.choice(len(STATUSES), size=n, p=STATUS_P)]
+
+    counts = item_counts(seed, chunk, n)
+    order_index = np.repeat(np.arange(n), counts)
+    product_id = _distinct_products(rng, order_index, len(prices))
+    quantity = rng.choice(QUANTITIES, size=len(order_index), p=QUANTITY_P)
+    unit_price = np.round(prices[product_id - 1] * rng.uniform(*PRICE_JITTER, size=len(order_index)), 2)
+    total_amount = np.round(np.bincount(order_index, weights=quantity * unit_price, minlength=n), 2)
+
+    order_id = np.arange(first_order_id, first_order_id + n)
+    orders = pd.DataFrame({
+        'order_id': order_id,
+        'customer_id': customer_id,
+        'order_date': order_date,
+        'total_amount': total_amount,
+        'status': status,
+    })
+    order_items = pd.DataFrame({
+        'order_item_id': np.arange(first_item_id, first_item_id + len(order_index)),
+        'order_id': order_id[order_index],
+        'product_id': product_id,
+        'quantity': quantity,
+        'unit_price': unit_price,
+    })
+    return orders, order_items
+
+
+# Blocos (número, primeiro id, tamanho) para n linhas
+def chunks(n, chunk_size):
+    return [(i, start + 1, min(chunk_size, n - start)) for i, start in enumerate(range(0, n, chunk_size))]
+
+
+# Grava uma tabela bloco a bloco em CSV ou Feather (Arrow IPC)
+class TableWriter:
+    def __init__(self, path, fmt):
+        self.path = path
+        self.fmt = fmt
+        self.rows = 0
+        self._writer = None
+
+    def write(self, df):
+        if self.fmt == 'csv':
+            df.to_csv(self.path, mode='w' if self.rows == 0 else 'a', header=self.rows == 0, index=False)
+        else:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            if self._writer is None:
+                self._writer = pa.ipc.new_file(self.path, table.schema)
+            self._writer.write_table(table)
+        self.rows += len(df)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+
+def _run(task):
+    function, args = task
+    return function(*args)
+
+
+# Resultados na ordem das tarefas, com no máximo `window` blocos gerados à frente da gravação
+def _ordered(tasks, workers):
+    if workers <= 1:
+        for task in tasks:
+            yield _run(task)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for task in tasks:
+            pending.append(executor.submit(_run, task))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def generate_dataset(output_dir, scale=1, seed=42, fmt='csv', chunk_size=DEFAULT_CHUNK_SIZE, workers=1):
+    if fmt not in ('csv', 'feather'):
+        raise ValueError("fmt deve ser 'csv' ou 'feather'")
+    os.makedirs(output_dir, exist_ok=True)
+    n_customers = max(1, int(round(BASE_CUSTOMERS * scale)))
+    n_orders = max(1, int(round(BASE_ORDERS * scale)))
+    pools = faker_pools(seed)
+    writers = {name: TableWriter(os.path.join(output_dir, f"{name}.{fmt}"), fmt)
+               for name in ['customers', 'products', 'orders', 'order_items']}
+
+    products = generate_products(seed, pools)
+    writers['products'].write(products)
+
+    customer_tasks = [(generate_customers, (seed, chunk, first_id, n, pools))
+                      for chunk, first_id, n in chunks(n_customers, chunk_size)]
+    for customers in _ordered(customer_tasks, workers):
+        writers['customers'].write(customers)
+
+    # O primeiro order_item_id de cada bloco depende dos itens dos blocos anteriores
+    order_tasks = []
+    first_item_id = 1
+    prices = products['price'].to_numpy()
+    for chunk, first_order_id, n in chunks(n_orders, chunk_size):
+        order_tasks.append((generate_orders, (seed, chunk, first_order_id, first_item_id, n, n_customers, prices)))
+        first_item_id += int(item_counts(seed, chunk, n).sum())
+    for orders, order_items in _ordered(order_tasks, workers):
+        writers['orders'].write(orders)
+        writers['order_items'].write(order_items)
+
+    for writer in writers.values():
+        writer.close()
+    schema_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Ecommerce_Dataset", "create_tables.sql")
+    if os.path.exists(schema_path):
+        shutil.copy(schema_path, os.path.join(output_dir, "create_tables.sql"))
+    return {name: writer.rows for name, writer in writers.items()}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gera o Ecommerce_Dataset sintético em escala.")
+    parser.add_argument("output_dir", help="pasta de destino")
+    parser.add_argument("--scale", type=float, default=1, help="fator de escala de clientes e pedidos (1 = 10.000 clientes e 50.000 pedidos)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--format", choices=['csv', 'feather'], default='csv')
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="linhas de clientes/pedidos por bloco")
+    parser.add_argument("--workers", type=int, default=1, help="processos para gerar os blocos")
+    args = parser.parse_args()
+    rows = generate_dataset(args.output_dir, args.scale, args.seed, args.format, args.chunk_size, args.workers)
+    for name, count in rows.items():
+        print(f"• {name}: {count:,} linhas")
+    print(f"Dados gravados em {args.output_dir}")
@@ -0,0 +1,26 @@
+# =============================================================================
+# TABELA FATO DE ITENS DE PEDIDO
+# =============================================================================
+# Junta order_items, orders, products, customers e rfm_segmentation uma única vez
+# no carregamento, com a receita de cada item já calculada. KPIs e gráficos do
+# dashboard filtram e agregam esta tabela em vez de refazer os merges.
+
+FACT_COLUMNS = ['order_id', 'customer_id', 'product_id', 'order_month', 'status',
+                'category', 'state', 'segment', 'item_revenue']
+
+
+def build_fact_table(orders, order_items, products, customers, rfm):
+    order_cols = orders[['order_id', 'customer_id', 'order_date', 'status']] \
+        .assign(order_month=lambda x: x['order_date'].dt.strftime('%Y-%m').astype('category'))
+    fact = order_items[['order_id', 'product_id', 'quantity', 'unit_price']] \
+        .merge(order_cols, on='order_id') \
+        .merge(products[['product_id', 'category']], on='product_id') \
+        .merge(customers[['customer_id', 'state']], on='customer_id', how='left') \
+        .merge(rfm[['customer_id', 'segment']], on='customer_id', how='left') \
+        .assign(item_revenue=lambda x: x['quantity'] * x['unit_price'])
+    return fact[FACT_COLUMNS]
+
+
+# Um registro por pedido (as colunas de pedido se repetem em cada item)
+def order_level(fact):
+    return fact.drop_duplicates('order_id')
@@ -0,0 +1,120 @@
+# =============================================================================
+# MOTOR DE FILTROS POR BITMAPS
+# =============================================================================
+# Construído uma única vez sobre a tabela fato: cada dimensão de filtro (mês,
+# categoria, status, estado e segmento RFM) guarda os códigos categóricos das
+# linhas e um bitmap compactado (np.packbits) por valor. Uma seleção dos filtros
+# vira OR dos bitmaps dentro de cada dimensão e AND entre dimensões, e o
+# resultado é um array de índices de linhas da tabela fato (sem cópias do DataFrame).
+# Os códigos usam o menor tipo inteiro sem sinal que comporta os valores da dimensão.
+# Linhas novas (append) e linhas alteradas (update) só reempacotam os bytes afetados.
+
+import numpy as np
+
+# Parâmetro do filtro -> coluna da tabela fato
+DIMENSIONS = {
+    'months': 'order_month',
+    'categories': 'category',
+    'statuses': 'status',
+    'states': 'state',
+    'rfm_segments': 'segment',
+}
+
+
+class FilterEngine:
+    def __init__(self, fact):
+        self.n_rows = 0
+        self.values = {dim: [] for dim in DIMENSIONS}
+        self.codes = {dim: np.empty(0, dtype=np.uint8) for dim in DIMENSIONS}
+        self.bitmaps = {dim: np.zeros((1, 0), dtype=np.uint8) for dim in DIMENSIONS}
+        self._positions = {dim: {} for dim in DIMENSIONS}
+        self.append(fact)
+
+    # Códigos de uma coluna. Valores novos entram no fim da lista e os valores
+    # ausentes (ex.: cliente sem segmento RFM) continuam no último slot.
+    def _encode(self, dim, series):
+        values = self.values[dim]
+        positions = self._positions[dim]
+        cat = series.astype('category').cat
+        new_values = [v for v in sorted(cat.categories) if v not in positions]
+        if new_values:
+            old_missing = len(values)
+            for v in new_values:
+                positions[v] = len(values)
+                values.append(v)
+            code_type = np.min_scalar_type(len(values))
+            self.codes[dim] = self.codes[dim].astype(np.promote_types(self.codes[dim].dtype, code_type), copy=False)
+            self.codes[dim][self.codes[dim] == old_missing] = len(values)
+            bitmaps = self.bitmaps[dim]
+            empty = np.zeros((len(new_values), bitmaps.shape[1]), dtype=np.uint8)
+            self.bitmaps[dim] = np.concatenate([bitmaps[:old_missing], empty, bitmaps[old_missing:]])
+        lookup = np.array([positions[v] for v in cat.categories] + [len(values)], dtype=self.codes[dim].dtype)
+        return lookup[cat.codes.to_numpy()]
+
+    # Reempacota os bytes indicados de todos os bitmaps de uma dimensão
+    def _pack(self, dim, byte_index):
+        rows = byte_index[:, None] * 8 + np.arange(8)
+        valid = rows < self.n_rows
+        block = self.codes[dim][np.minimum(rows, self.n_rows - 1)]
+        bitmaps = self.bitmaps[dim]
+        for i in range(len(bitmaps)):
+            bitmaps[i, byte_index] = np.packbits((block == i) & valid, axis=1)[:, 0]
+
+    # Acrescenta linhas novas da tabela fato
+    def append(self, fact_rows):
+        start = self.n_rows
+        self.n_rows += len(fact_rows)
+        n_bytes = (self.n_rows + 7) // 8
+        for dim, col in DIMENSIONS.items():
+            codes = self._encode(dim, fact_rows[col])
+            self.codes[dim] = np.concatenate([self.codes[dim], codes])
+            bitmaps = self.bitmaps[dim]
+            padding = np.zeros((len(bitmaps), n_bytes - bitmaps.shape[1]), dtype=np.uint8)
+            self.bitmaps[dim] = np.concatenate([bitmaps, padding], axis=1)
+            if self.n_rows > start:
+                self._pack(dim, np.arange(start // 8, n_bytes))
+
+    # Atualiza linhas existentes (ex.: clientes que mudaram de segmento RFM)
+    def update(self, rows, fact_rows):
+        if len(rows) == 0:
+            return
+        byte_index = np.unique(rows // 8)
+        for dim, col in DIMENSIONS.items():
+            self.codes[dim][rows] = self._encode(dim, fact_rows[col])
+            self._pack(dim, byte_index)
+
+    # Bitmap das linhas que passam no filtro de uma dimensão (None = sem restrição)
+    def dimension_mask(self, dim, selected):
+        bitmaps = self.bitmaps[dim]
+        positions = self._positions[dim]
+        chosen = {positions[v] for v in selected if v in positions}
+        others = [i for i in range(len(bitmaps)) if i not in chosen]
+        if not others:
+            return None
+        if not chosen:
+            return np.zeros(bitmaps.shape[1], dtype=np.uint8)
+        # Combina o lado menor: OR dos selecionados ou complemento dos não selecionados
+        if len(chosen) <= len(others):
+            return np.bitwise_or.reduce(bitmaps[sorted(chosen)], axis=0)
+        return ~np.bitwise_or.reduce(bitmaps[others], axis=0)
+
+    # Índices das linhas da tabela fato que passam em todos os filtros
+    def select(self, months, categories, statuses, states, rfm_segments):
+        selections = {'months': months, 'categories': categories, 'statuses': statuses, 'states': states}
+        # Segmento RFM só filtra quando há seleção
+        if rfm_segments:
+            selections['rfm_segments'] = rfm_segments
+        acc = None
+        for dim, selected in selections.items():
+            mask = self.dimension_mask(dim, selected)
+            if mask is None:
+                continue
+            if acc is None:
+                acc = mask
+            else:
+                acc &= mask
+            if not acc.any():
+                return np.empty(0, dtype=np.intp)
+        if acc is None:
+            return np.arange(self.n_rows)
+        return np.flatnonzero(np.unpackbits(acc, count=self.n_rows))
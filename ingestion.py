@@ -0,0 +1,354 @@
+# =============================================================================
+# INGESTÃO INCREMENTAL DE NOVOS PEDIDOS
+# =============================================================================
+# Lotes novos de pedidos são arquivos CSV colocados em Ecommerce_Dataset/incoming/:
+#   orders_<lote>.csv        (obrigatório)
+#   order_items_<lote>.csv   (itens dos pedidos do mesmo lote)
+# Grave cada arquivo com outro nome e renomeie ao final, para o dashboard não ler
+# arquivos pela metade, e publique o order_items_<lote>.csv antes do orders_<lote>.csv.
+# Os lotes são validados contra create_tables.sql (tipos, chaves primárias e
+# estrangeiras) e são apenas de inclusão: os itens precisam pertencer a pedidos
+# do próprio lote.
+# O Dataset é compartilhado por todas as sessões do processo. Cada lote gera um
+# novo DatasetState (cópia do anterior com as estruturas derivadas atualizadas só
+# nas partes afetadas) que substitui o atual de forma atômica; as sessões veem os
+# dados novos na próxima interação, sem limpar cache nem reiniciar.
+# Os pedidos ficam em partições mensais (ver snapshot.py): o estado guarda só os
+# agregados globais, lidos do resumo gravado com as partições (ver
+# partition_summary.py), e monta a partição de um mês (tabela fato, bitmaps e cubo)
+# na primeira consulta que seleciona esse mês. Lotes de meses ainda não carregados
+# ficam pendentes e entram na partição quando ela é carregada.
+# No modo compacto (ver compact.py) tabelas, partições e lotes usam o esquema
+# compacto. Com um orçamento de memória, o carregamento inicial e o de cada
+# partição são recusados (MemoryBudgetError) quando o estado passaria do limite.
+# O tamanho de uma partição é estimado antes de lê-la (itens do mês x bytes por
+# item) e a recusa fica registrada: consultas seguintes ao mesmo mês falham sem
+# carregá-lo de novo.
+
+import copy
+import logging
+import os
+import re
+import threading
+
+import numpy as np
+import pandas as pd
+
+import snapshot
+from compact import PARTITION_ROW_BYTES, MemoryBudgetError, compact_table, format_sizes, resident_size
+from cube import Cube
+from fact_table import build_fact_table
+from filter_engine import FilterEngine
+from partition_summary import (combine_id_ranges, combine_summaries, id_range, in_range, new_customers_by_month,
+                               summarize)
+from rfm import RFMModel
+from schema import SchemaError, coerce, load_schema
+from snapshot import concat_tables, split_by_month
+
+INCOMING_DIR = "incoming"
+logger = logging.getLogger("dashboard.memory")
+_BATCH_RE = re.compile(r'^orders_(.+)\.csv$')
+
+# Um mês de pedidos: itens, tabela fato, motor de filtros e cubo só desse mês
+class Partition:
+    def __init__(self, month, orders, order_items, products, customers, rfm):
+        self.month = month
+        self.orders = orders
+        self.order_items = order_items
+        self.fact = build_fact_table(orders, order_items, products, customers, rfm)
+        self.filter_engine = FilterEngine(self.fact)
+        self.cube = Cube(self.fact)
+        self.size = resident_size(self)
+
+    # Partição a partir de partes já montadas (ex.: publicadas por outro processo)
+    @classmethod
+    def from_parts(cls, month, orders, order_items, fact, filter_engine, cube):
+        partition = cls.__new__(cls)
+        partition.month = month
+        partition.orders = orders
+        partition.order_items = order_items
+        partition.fact = fact
+        partition.filter_engine = filter_engine
+        partition.cube = cube
+        partition.size = resident_size(partition)
+        return partition
+
+    # Nova partição com os pedidos do lote e o segmento atualizado dos clientes
+    # que mudaram; a partição atual não é alterada
+    def ingest(self, orders_batch, items_batch, products, customers, rfm, changed):
+        rows = np.flatnonzero(self.fact['customer_id'].isin(changed).to_numpy())
+        if orders_batch.empty and len(rows) == 0:
+            return self
+        new = copy.copy(self)
+        new.orders = concat_tables(self.orders, orders_batch)
+        new.order_items = concat_tables(self.order_items, items_batch)
+
+        # Tabela fato: linhas novas no fim e segmento atualizado nas linhas dos clientes que mudaram
+        new_rows = build_fact_table(orders_batch, items_batch, products, customers, rfm)
+        fact = concat_tables(self.fact, new_rows)
+        old_rows = fact.iloc[rows].copy()
+        after = rfm.set_index('customer_id')['segment']
+        segments = fact['segment'].cat.add_categories(
+            [s for s in after.cat.categories if s not in fact['segment'].cat.categories])
+        segments.iloc[rows] = old_rows['customer_id'].map(after).to_numpy()
+        fact['segment'] = segments
+        new.fact = fact
+
+        new.filter_engine = copy.deepcopy(self.filter_engine)
+        new.cube = copy.deepcopy(self.cube)
+        if len(new_rows):
+            new.filter_engine.append(new_rows)
+            new.cube.add(new_rows)
+        new.filter_engine.update(rows, fact.iloc[rows])
+        new.cube.update(old_rows, fact, rows)
+        new.size = resident_size(new)
+        return new
+
+
+class DatasetState:
+    def __init__(self, store, products, customers, memory_budget=None):
+        self.version = 0
+        self.memory_budget = memory_budget
+        self.store = store
+        self.products = products
+        self.customers = customers
+        self.partitions = {}
+        self.pending = {}
+        self.refused = {}
+        self._lock = threading.Lock()
+
+        # Só o resumo das partições é lido: nenhuma partição é carregada aqui
+        self.summary, aggregates, self.id_ranges = store.load_summary(products)
+        self.months = list(store.months)
+        self.rfm_model = RFMModel.from_aggregates(aggregates, customers, self.reference_date)
+        self.new_customers_monthly = new_customers_by_month(self.summary.first_orders)
+        self.base_sizes = self._base_sizes()
+        self.check_budget(0, "os dados")
+
+    # Memória das tabelas e agregados sempre carregados
+    def _base_sizes(self):
+        return {'products': resident_size(self.products), 'customers': resident_size(self.customers),
+                'resumo': resident_size(self.summary), 'rfm': resident_size(self.rfm_model),
+                'pedidos em memória': resident_size(self.store) + resident_size(self.pending)}
+
+    # Memória estimada de cada parte do estado, incluindo as partições carregadas
+    def memory_usage(self):
+        sizes = dict(self.base_sizes)
+        for month in sorted(self.partitions):
+            sizes[f"partição {month}"] = self.partitions[month].size
+        return sizes
+
+    def check_budget(self, extra, what):
+        if self.memory_budget is None:
+            return
+        total = sum(self.memory_usage().values()) + extra
+        if total > self.memory_budget:
+            raise MemoryBudgetError(f"Carregar {what} ocuparia {total / 2 ** 20:.1f} MB, "
+                                    f"acima do orçamento de {self.memory_budget / 2 ** 20:.0f} MB")
+
+    @property
+    def rfm(self):
+        return self.rfm_model.table
+
+    # Data de referência padrão do RFM: último dia nos dados + 1
+    @property
+    def reference_date(self):
+        return self.summary.last_order_date.normalize() + pd.Timedelta(days=1)
+
+    # orders e order_items de um mês: da partição carregada ou do snapshot e dos lotes pendentes
+    def month_tables(self, month):
+        partition = self.partitions.get(month)
+        if partition is not None:
+            return [(partition.orders, partition.order_items)]
+        tables = [self.store.load(month)] if month in self.store.months else []
+        return tables + self.pending.get(month, [])
+
+    # Indica se algum order_id e algum order_item_id já existem. Só são lidos os meses
+    # cujo intervalo de IDs alcança os IDs procurados (normalmente nenhum, já que os
+    # IDs novos são maiores que os existentes).
+    def existing_keys(self, order_ids, item_ids):
+        found_orders = found_items = False
+        for month, ranges in self.id_ranges.items():
+            check_orders = not found_orders and in_range(order_ids, ranges['orders'])
+            check_items = not found_items and in_range(item_ids, ranges['order_items'])
+            if not (check_orders or check_items):
+                continue
+            for orders, order_items in self.month_tables(month):
+                found_orders = found_orders or (check_orders and order_ids.isin(orders['order_id']).any())
+                found_items = found_items or (check_items and item_ids.isin(order_items['order_item_id']).any())
+        return found_orders, found_items
+
+    # Memória estimada de uma partição antes de carregá-la: itens do mês x bytes por item
+    # (média das partições já carregadas ou, antes da primeira, PARTITION_ROW_BYTES)
+    def estimated_size(self, month):
+        rows = self.store.rows(month) + sum(len(items) for _, items in self.pending.get(month, []))
+        loaded_rows = sum(len(p.order_items) for p in self.partitions.values())
+        if loaded_rows:
+            return int(rows * sum(p.size for p in self.partitions.values()) / loaded_rows)
+        return rows * PARTITION_ROW_BYTES[self.store.compact]
+
+    def build_partition(self, month):
+        tables = self.month_tables(month)
+        orders = concat_tables(*(t[0] for t in tables))
+        order_items = concat_tables(*(t[1] for t in tables))
+        partition = Partition(month, orders, order_items, self.products, self.customers, self.rfm)
+        self.pending.pop(month, None)
+        return partition
+
+    # Partição de um mês, carregada e indexada no primeiro uso. Com orçamento de memória,
+    # a estimativa é verificada antes da leitura e o tamanho real depois dela.
+    def partition(self, month):
+        partition = self.partitions.get(month)
+        if partition is None:
+            with self._lock:
+                partition = self.partitions.get(month)
+                if partition is None:
+                    if month in self.refused:
+                        raise MemoryBudgetError(self.refused[month])
+                    what = f"a partição {month}"
+                    try:
+                        self.check_budget(self.estimated_size(month), what)
+                        partition = self.build_partition(month)
+                        self.check_budget(partition.size, what)
+                    except MemoryBudgetError as e:
+                        self.refused[month] = str(e)
+                        raise
+                    self.partitions[month] = partition
+        return partition
+
+    # Partições dos meses selecionados (os demais meses não são lidos)
+    def select_partitions(self, months):
+        selected = set(months)
+        return [self.partition(month) for month in self.months if month in selected]
+
+    # Novo estado com o lote incorporado; o estado atual não é alterado
+    def ingest(self, orders_batch, items_batch):
+        new = copy.copy(self)
+        new.version = self.version + 1
+        new._lock = threading.Lock()
+        batch_summary = summarize(orders_batch, items_batch, self.products)
+        new.summary = combine_summaries([self.summary, batch_summary])
+
+        # RFM: só os clientes do lote são repontuados, a menos que o lote avance a data de referência
+        new.rfm_model = copy.deepcopy(self.rfm_model)
+        new.rfm_model.update(orders_batch)
+        if orders_batch['order_date'].max() >= new.rfm_model.reference_date:
+            new.rfm_model.reference_date = new.reference_date
+            new.rfm_model.rescore()
+        before = self.rfm.set_index('customer_id')['segment']
+        after = new.rfm.set_index('customer_id')['segment']
+        before = before.reindex(after.index).astype(object)
+        changed = after.index[before.ne(after.astype(object))]
+
+        # Partições: as já carregadas recebem o lote do seu mês e os novos segmentos;
+        # as demais guardam o lote para quando forem carregadas
+        batch_partitions = split_by_month(orders_batch, items_batch)
+        no_orders, no_items = orders_batch.iloc[0:0], items_batch.iloc[0:0]
+        new.partitions = {}
+        new.refused = dict(self.refused)
+        new.pending = {month: list(tables) for month, tables in self.pending.items()}
+        for month, partition in list(self.partitions.items()):
+            orders, items = batch_partitions.get(month, (no_orders, no_items))
+            new.partitions[month] = partition.ingest(orders, items, self.products, self.customers, new.rfm, changed)
+        for month, tables in batch_partitions.items():
+            if month not in self.partitions:
+                new.pending.setdefault(month, []).append(tables)
+        new.months = sorted(set(self.months) | set(batch_partitions))
+        new.id_ranges = dict(self.id_ranges)
+        for month, tables in batch_partitions.items():
+            batch_range = id_range(*tables)
+            new.id_ranges[month] = combine_id_ranges(self.id_ranges[month], batch_range) \
+                if month in self.id_ranges else batch_range
+
+        # Novos clientes por mês: ajusta apenas os clientes cujo primeiro pedido mudou
+        batch_first = batch_summary.first_orders
+        current = self.summary.first_orders.reindex(batch_first.index)
+        moved = batch_first[current.isna() | (batch_first < current)]
+        removed = current[moved.index].dropna().dt.strftime('%Y-%m').value_counts()
+        added = moved.dt.strftime('%Y-%m').value_counts()
+        monthly = self.new_customers_monthly.add(added, fill_value=0).sub(removed, fill_value=0).astype(np.int64)
+        new.new_customers_monthly = monthly[monthly > 0].sort_index()
+        new.base_sizes = new._base_sizes()
+        return new
+
+
+class Dataset:
+    def __init__(self, base_path, compact=False, memory_budget_mb=None):
+        self.base_path = base_path
+        self.compact = compact
+        self.incoming_path = os.path.join(base_path, INCOMING_DIR)
+        self.schema = load_schema(os.path.join(base_path, 'create_tables.sql'))
+        self.rejected = {}
+        self._seen = {}
+        self._lock = threading.Lock()
+        tables = snapshot.load_tables(base_path, ['products', 'customers'])
+        if compact:
+            tables = {name: compact_table(df, name) for name, df in tables.items()}
+        memory_budget = memory_budget_mb * 2 ** 20 if memory_budget_mb else None
+        self.state = DatasetState(snapshot.PartitionStore(base_path, compact), tables['products'], tables['customers'],
+                                  memory_budget)
+        logger.info("Memória no carregamento (esquema %s): %s", 'compacto' if compact else 'completo',
+                    format_sizes(self.state.memory_usage()))
+        self.refresh()
+
+    @property
+    def version(self):
+        return self.state.version
+
+    # Lotes ainda não processados (ou modificados desde o último processamento)
+    def pending_batches(self):
+        if not os.path.isdir(self.incoming_path):
+            return []
+        batches = []
+        for entry in sorted(os.scandir(self.incoming_path), key=lambda e: e.name):
+            match = _BATCH_RE.match(entry.name)
+            if match and self._seen.get(entry.name) != entry.stat().st_mtime:
+                batches.append((match.group(1), entry))
+        return batches
+
+    def read_batch(self, batch):
+        orders_path = os.path.join(self.incoming_path, f"orders_{batch}.csv")
+        items_path = os.path.join(self.incoming_path, f"order_items_{batch}.csv")
+        orders = coerce(pd.read_csv(orders_path, dtype=str), self.schema['orders'])
+        if os.path.exists(items_path):
+            items = coerce(pd.read_csv(items_path, dtype=str), self.schema['order_items'])
+        else:
+            items = coerce(pd.DataFrame(columns=list(self.schema['order_items'].columns)), self.schema['order_items'])
+        self.validate_keys(orders, items)
+        orders, items = snapshot.apply_schema(orders, 'orders'), snapshot.apply_schema(items, 'order_items')
+        if self.compact:
+            return compact_table(orders, 'orders'), compact_table(items, 'order_items')
+        return orders, items
+
+    # Chaves primárias novas e chaves estrangeiras existentes
+    def validate_keys(self, orders, items):
+        state = self.state
+        problems = []
+        existing_orders, existing_items = state.existing_keys(orders['order_id'], items['order_item_id'])
+        if existing_orders:
+            problems.append("orders: order_id já existente")
+        if existing_items:
+            problems.append("order_items: order_item_id já existente")
+        references = {'customers': state.customers, 'products': state.products, 'orders': orders}
+        for table, df in (('orders', orders), ('order_items', items)):
+            for column, (ref_table, ref_column) in self.schema[table].foreign_keys.items():
+                unknown = ~df[column].isin(references[ref_table][ref_column])
+                if unknown.any():
+                    problems.append(f"{table}.{column}: {int(unknown.sum())} valores sem correspondência em {ref_table}")
+        if problems:
+            raise SchemaError('; '.join(problems))
+
+    # Incorpora os lotes pendentes e devolve o estado atual
+    def refresh(self):
+        if not self.pending_batches():
+            return self.state
+        with self._lock:
+            for batch, entry in self.pending_batches():
+                try:
+                    orders, items = self.read_batch(batch)
+                    self.state = self.state.ingest(orders, items)
+                    self.rejected.pop(batch, None)
+                except (SchemaError, OSError, pd.errors.ParserError) as e:
+                    self.rejected[batch] = str(e)
+                self._seen[entry.name] = entry.stat().st_mtime
+        return self.state
@@ -0,0 +1,235 @@
+# =============================================================================
+# INSTRUMENTAÇÃO DO DASHBOARD (TEMPO, LINHAS, MEMÓRIA E CACHE POR ETAPA)
+# =============================================================================
+# Cada execução (rerun) do dashboard abre um Trace; cada etapa do pipeline
+# (carga, filtros, KPIs, agregações, montagem de gráficos, tabela RFM) é medida
+# com trace.stage(...): duração, linhas de entrada e saída e memória alocada.
+# Chamadas a funções em cache passam por trace.cached(...), que registra acerto
+# ou falha do cache (a função marca metrics.computed() quando realmente executa).
+# Os registros vão para:
+#   - o log estruturado (uma linha JSON por etapa, logger "dashboard.metrics");
+#   - os agregados do processo (METRICS), expostos no formato texto do Prometheus
+#     por serve_metrics(porta), em http://<host>:<porta>/metrics;
+#   - o próprio Trace, mostrado no painel "Performance" do dashboard.
+# Seções que reexecutam sozinhas (fragmentos do Streamlit) usam trace.fragment(nome):
+# dentro da execução completa medem no Trace dela; quando só o fragmento reexecuta,
+# medem em um Trace próprio, registrado com o nome do fragmento.
+# Memória: com tracemalloc ativo (PYTHONTRACEMALLOC=1) é o pico alocado pelo
+# Python/NumPy durante a etapa; sem ele, o crescimento do RSS do processo (Linux),
+# zero quando o RSS diminui (memória devolvida durante a etapa não é alocação).
+
+import json
+import logging
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger("dashboard.metrics")
+
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+# Memória residente do processo em bytes (None fora do Linux)
+def resident_memory():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+class Stage:
+    def __init__(self, name):
+        self.name = name
+        self.seconds = 0.0
+        self.rows_in = None
+        self.rows_out = None
+        self.memory = None
+        self.cache = None
+
+    def rows(self, rows_in=None, rows_out=None):
+        if rows_in is not None:
+            self.rows_in = int(rows_in)
+        if rows_out is not None:
+            self.rows_out = int(rows_out)
+
+    def as_dict(self):
+        return {'stage': self.name, 'seconds': round(self.seconds, 6), 'rows_in': self.rows_in,
+                'rows_out': self.rows_out, 'memory_bytes': self.memory, 'cache': self.cache}
+
+
+# Agregados de todas as execuções do processo (compartilhados entre as sessões)
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.stages = {}
+        self.caches = {}
+        self.reruns = {}
+
+    def record(self, stage):
+        with self._lock:
+            stats = self.stages.setdefault(stage.name, {'count': 0, 'seconds': 0.0, 'rows_in': 0,
+                                                        'rows_out': 0, 'memory_max': 0})
+            stats['count'] += 1
+            stats['seconds'] += stage.seconds
+            stats['rows_in'] += stage.rows_in or 0
+            stats['rows_out'] += stage.rows_out or 0
+            stats['memory_max'] = max(stats['memory_max'], stage.memory or 0)
+            if stage.cache is not None:
+                hits, misses = self.caches.get(stage.name, (0, 0))
+                self.caches[stage.name] = (hits + (stage.cache == 'hit'), misses + (stage.cache == 'miss'))
+
+    def record_rerun(self, name, seconds):
+        with self._lock:
+            count, total = self.reruns.get(name, (0, 0.0))
+            self.reruns[name] = (count + 1, total + seconds)
+
+    # Chamado dentro da função em cache: só executa quando o cache falha
+    def computed(self):
+        self._local.computed = True
+
+    def _take_computed(self):
+        computed = getattr(self._local, 'computed', False)
+        self._local.computed = False
+        return computed
+
+    def hit_rate(self, name):
+        hits, misses = self.caches.get(name, (0, 0))
+        return hits / (hits + misses) if hits + misses else None
+
+    # Formato texto de exposição do Prometheus
+    def prometheus(self):
+        with self._lock:
+            stages = {name: dict(stats) for name, stats in self.stages.items()}
+            caches = dict(self.caches)
+            reruns = dict(self.reruns)
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                label_text = ','.join(f'{k}="{v}"' for k, v in labels.items())
+                lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+
+        metric("dashboard_reruns_total", "counter", "Execuções do dashboard (completas ou só de um fragmento).",
+               [({'scope': n}, count) for n, (count, _) in reruns.items()])
+        metric("dashboard_rerun_seconds_total", "counter", "Tempo total das execuções do dashboard.",
+               [({'scope': n}, f"{total:.6f}") for n, (_, total) in reruns.items()])
+        metric("dashboard_stage_calls_total", "counter", "Execuções de cada etapa.",
+               [({'stage': n}, s['count']) for n, s in stages.items()])
+        metric("dashboard_stage_seconds_total", "counter", "Tempo gasto em cada etapa.",
+               [({'stage': n}, f"{s['seconds']:.6f}") for n, s in stages.items()])
+        metric("dashboard_stage_rows_in_total", "counter", "Linhas de entrada de cada etapa.",
+               [({'stage': n}, s['rows_in']) for n, s in stages.items()])
+        metric("dashboard_stage_rows_out_total", "counter", "Linhas de saída de cada etapa.",
+               [({'stage': n}, s['rows_out']) for n, s in stages.items()])
+        metric("dashboard_stage_memory_max_bytes", "gauge", "Maior memória alocada em uma execução da etapa.",
+               [({'stage': n}, s['memory_max']) for n, s in stages.items()])
+        metric("dashboard_cache_hits_total", "counter", "Acertos do cache por função.",
+               [({'function': n}, hits) for n, (hits, _) in caches.items()])
+        metric("dashboard_cache_misses_total", "counter", "Falhas do cache por função.",
+               [({'function': n}, misses) for n, (_, misses) in caches.items()])
+        rss = resident_memory()
+        if rss is not None:
+            metric("dashboard_resident_memory_bytes", "gauge", "Memória residente do processo.", [({}, rss)])
+        return '\n'.join(lines) + '\n'
+
+
+METRICS = Metrics()
+
+
+# Etapas medidas em uma execução do dashboard
+class Trace:
+    def __init__(self, metrics=METRICS, name='rerun'):
+        self.metrics = metrics
+        self.name = name
+        self.stages = []
+        self.started = time.perf_counter()
+        self.finished = False
+
+    @contextmanager
+    def stage(self, name, rows_in=None):
+        stage = Stage(name)
+        stage.rows(rows_in=rows_in)
+        tracing = tracemalloc.is_tracing()
+        if tracing:
+            baseline = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        else:
+            baseline = resident_memory()
+        start = time.perf_counter()
+        try:
+            yield stage
+        finally:
+            stage.seconds = time.perf_counter() - start
+            if tracing:
+                stage.memory = max(tracemalloc.get_traced_memory()[1] - baseline, 0)
+            elif baseline is not None:
+                stage.memory = max(resident_memory() - baseline, 0)
+            self.stages.append(stage)
+            self.metrics.record(stage)
+            logger.info(json.dumps(stage.as_dict(), ensure_ascii=False))
+
+    # Chama uma função em cache registrando acerto ou falha (rows_out conta as linhas do resultado)
+    def cached(self, name, function, *args, rows_out=None):
+        with self.stage(name) as stage:
+            self.metrics._take_computed()
+            result = function(*args)
+            stage.cache = 'miss' if self.metrics._take_computed() else 'hit'
+            if rows_out is not None:
+                stage.rows(rows_out=rows_out(result))
+        return result
+
+    @property
+    def seconds(self):
+        return time.perf_counter() - self.started
+
+    # Encerra a execução: registra o total e devolve o detalhamento por etapa
+    def finish(self):
+        total = self.seconds
+        self.finished = True
+        self.metrics.record_rerun(self.name, total)
+        logger.info(json.dumps({'stage': self.name, 'seconds': round(total, 6), 'stages': len(self.stages)}))
+        return [stage.as_dict() for stage in self.stages]
+
+    # Trace de um fragmento: o desta execução, ou um novo se a execução completa já terminou
+    @contextmanager
+    def fragment(self, name):
+        if not self.finished:
+            yield self
+            return
+        trace = Trace(self.metrics, name)
+        try:
+            yield trace
+        finally:
+            trace.finish()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    metrics = METRICS
+
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = self.metrics.prometheus().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+# Servidor HTTP do endpoint /metrics em uma thread de fundo
+def serve_metrics(port, host='0.0.0.0'):
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name='metrics-server', daemon=True).start()
+    return server
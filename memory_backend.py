@@ -0,0 +1,182 @@
+# =============================================================================
+# BACKEND EM MEMÓRIA (TABELA FATO + MOTOR DE FILTROS + CUBO)
+# =============================================================================
+# Responde às consultas do dashboard a partir do DatasetState atual (ver
+# ingestion.py): só as partições mensais dos meses selecionados são carregadas e
+# consultadas. Totais e gráficos aditivos somam os cubos das partições; clientes
+# únicos vêm das linhas filtradas pelos bitmaps ou dos sketches HyperLogLog
+# combinados. Visões sem filtro (top produtos, clientes por categoria) usam os
+# agregados globais do estado. Expõe a mesma interface do backend SQL
+# (sql_backend.py), escolhido em DASHBOARD_BACKEND. Com compact=True os dados
+# ficam no esquema compacto, e memory_budget_mb limita a memória do estado. Com
+# shared=True o estado vem da versão publicada pelo carregador (shared_dataset.py).
+
+import numpy as np
+import pandas as pd
+
+import snapshot
+from filter_engine import DIMENSIONS
+from ingestion import Dataset
+from rfm import compute_rfm
+from shared_dataset import SharedDataset
+from sketches import estimate
+
+
+# Medida por uma dimensão somada entre partições
+def combined_rollup(partitions, measure, dim, selection):
+    rollups = [p.cube.rollup(measure, dim, **selection) for p in partitions]
+    if not rollups:
+        return pd.Series([], dtype=float, index=pd.Index([], dtype=object, name=DIMENSIONS[dim]), name=measure)
+    return pd.concat(rollups).groupby(level=0).sum()
+
+
+# Índices das linhas que passam nos filtros em cada partição
+def select_rows(partitions, selection):
+    return [(p, p.filter_engine.select(**selection)) for p in partitions]
+
+
+class MemoryBackend:
+    name = 'memoria'
+    supports_approximate = True
+
+    def __init__(self, base_path, compact=False, memory_budget_mb=None, shared=False):
+        if shared:
+            self.dataset = SharedDataset(base_path, memory_budget_mb)
+        else:
+            self.dataset = Dataset(base_path, compact, memory_budget_mb)
+
+    @property
+    def version(self):
+        return self.dataset.version
+
+    @property
+    def rejected(self):
+        return self.dataset.rejected
+
+    # Incorpora os lotes pendentes e devolve a versão atual dos dados
+    def refresh(self):
+        self.dataset.refresh()
+        return self.version
+
+    # Memória estimada de cada tabela, agregado e partição carregada
+    def memory_usage(self):
+        return self.dataset.state.memory_usage()
+
+    # Valores disponíveis em cada filtro
+    def options(self):
+        state = self.dataset.state
+        return {
+            'months': list(state.months),
+            'categories': sorted(state.products['category'].unique().tolist()),
+            'statuses': sorted(state.summary.statuses),
+            'states': sorted(state.customers['state'].unique().tolist()),
+            'rfm_segments': sorted(state.rfm['segment'].unique().tolist()),
+        }
+
+    # Partições dos meses selecionados com os índices das linhas que passam nos filtros
+    def filter(self, selection):
+        return select_rows(self.dataset.state.select_partitions(selection['months']), selection)
+
+    def matching_rows(self, selection):
+        return sum(len(rows) for _, rows in self.filter(selection))
+
+    def kpis(self, selection, approximate_customers=False):
+        state = self.dataset.state
+        partitions = state.select_partitions(selection['months'])
+        total_revenue = sum(p.cube.total('revenue', **selection) for p in partitions)
+        if not partitions:
+            unique_customers = 0
+        elif approximate_customers:
+            registers = np.maximum.reduce([p.cube.customer_registers(**selection) for p in partitions])
+            unique_customers = int(round(estimate(registers)[0]))
+        else:
+            customers = [p.fact['customer_id'].to_numpy()[rows] for p, rows in select_rows(partitions, selection)]
+            unique_customers = len(np.unique(np.concatenate(customers)))
+        total_orders = sum(p.cube.total('orders', **selection) for p in partitions)
+        avg_ticket = total_revenue / total_orders if total_orders > 0 else 0
+        avg_orders_per_customer = total_orders / unique_customers if unique_customers > 0 else 0
+        delivered = {**selection, 'statuses': [s for s in selection['statuses'] if s == 'Entregue']}
+        delivered_orders = sum(p.cube.total('orders', **delivered) for p in partitions)
+        n_orders = state.summary.n_orders
+        conversion_rate = (delivered_orders / n_orders) * 100 if n_orders > 0 else 0
+        return total_revenue, unique_customers, total_orders, avg_ticket, avg_orders_per_customer, conversion_rate
+
+    def visualizations(self, selection, approximate_customers=False):
+        state = self.dataset.state
+        partitions = state.select_partitions(selection['months'])
+
+        # Top 5 Produtos (usando dados brutos para todas as categorias)
+        top_products = state.summary.product_revenue \
+                           .reset_index(name='total_revenue') \
+                           .merge(state.products[['product_id', 'product_name', 'category']], on='product_id') \
+                           .groupby(['product_name', 'category'], observed=True) \
+                           .agg({'total_revenue': 'sum'}) \
+                           .reset_index() \
+                           .sort_values('total_revenue', ascending=False) \
+                           .head(5)
+
+        # Receita por Categoria (com filtros)
+        revenue_by_category = combined_rollup(partitions, 'revenue', 'categories', selection) \
+                                  .reset_index(name='total_revenue')
+
+        # Receita por Estado (com filtros)
+        revenue_by_state = combined_rollup(partitions, 'revenue', 'states', selection) \
+                               .reset_index(name='total_revenue')
+
+        # Receita Mensal (com filtros)
+        revenue_monthly = combined_rollup(partitions, 'revenue', 'months', selection) \
+                              .reset_index(name='total_amount') \
+                              .rename(columns={'order_month': 'order_date'})
+
+        # Status de Pedidos (com filtros)
+        status_counts = combined_rollup(partitions, 'orders', 'statuses', selection) \
+                            .sort_values(ascending=False).reset_index()
+        status_counts.columns = ['status', 'count']
+
+        # Clientes Únicos por Mês (com filtros; cada partição é um mês)
+        if approximate_customers:
+            counts = [p.cube.distinct_customers(**selection) for p in partitions]
+        else:
+            counts = [len(np.unique(p.fact['customer_id'].to_numpy()[rows])) for p, rows in select_rows(partitions, selection)]
+        monthly_customers = pd.Series(
+            counts,
+            index=pd.Index([p.month for p in partitions], dtype=object, name='order_month'), dtype=np.int64)
+        monthly_customers = monthly_customers[monthly_customers > 0] \
+                                             .reset_index(name='unique_customers') \
+                                             .rename(columns={'order_month': 'order_date'})
+
+        # Pedidos Totais por Mês (com filtros)
+        total_orders_by_month = combined_rollup(partitions, 'orders', 'months', selection) \
+                                    .reset_index(name='total_orders') \
+                                    .rename(columns={'order_month': 'order_date'})
+
+        # Clientes por Categoria (usando dados brutos; contagem exata a partir das marcas cliente x categoria)
+        clientes_categoria = state.summary.category_customers.sum()
+        clientes_categoria = clientes_categoria[clientes_categoria > 0].reset_index(name='unique_customers')
+
+        return top_products, revenue_by_category, revenue_by_state, revenue_monthly, status_counts, monthly_customers, total_orders_by_month, clientes_categoria
+
+    def customers_by_state(self):
+        clientes_por_estado = self.dataset.state.customers['state'].value_counts().reset_index()
+        clientes_por_estado.columns = ['state', 'count']
+        return clientes_por_estado
+
+    def new_customers_monthly(self):
+        new_customers_monthly = self.dataset.state.new_customers_monthly.reset_index()
+        new_customers_monthly.columns = ['month', 'new_customers']
+        return new_customers_monthly
+
+    def rfm_table(self):
+        return self.dataset.state.rfm
+
+    # RFM recalculado só com os pedidos dos meses e estados selecionados (mesma data de referência)
+    def segment_population(self, months, states):
+        state = self.dataset.state
+        customers = state.customers
+        partitions = state.select_partitions(months)
+        if partitions:
+            orders = pd.concat([p.orders for p in partitions], ignore_index=True)
+        else:
+            orders = snapshot.apply_schema(pd.DataFrame(columns=list(self.dataset.schema['orders'].columns)), 'orders')
+        population = orders[orders['customer_id'].isin(customers.loc[customers['state'].isin(states), 'customer_id'])]
+        return compute_rfm(population, customers, state.reference_date)
@@ -0,0 +1,108 @@
+# =============================================================================
+# RESUMO DAS PARTIÇÕES MENSAIS
+# =============================================================================
+# Agregados globais que não dependem dos filtros (contagens, primeiro pedido de
+# cada cliente, receita por produto, clientes por categoria e agregados do RFM).
+# São calculados partição a partição quando as partições são gravadas (ver
+# snapshot.py) e somados a cada lote; o dashboard lê só o resumo no carregamento,
+# sem abrir as partições. O tamanho do resumo depende do número de clientes,
+# produtos e categorias, não do histórico de pedidos.
+# A validação das chaves dos lotes usa o intervalo (mínimo e máximo) de order_id e
+# order_item_id de cada mês, em vez de manter todos os IDs em memória.
+
+from collections import namedtuple
+from functools import reduce
+
+import pandas as pd
+
+from rfm import customer_aggregates
+
+Summary = namedtuple('Summary', ['n_orders', 'statuses', 'last_order_date', 'first_orders',
+                                 'product_revenue', 'category_customers'])
+
+
+# Primeiro pedido de cada cliente (todos os status)
+def first_order_dates(orders):
+    return orders.groupby('customer_id')['order_date'].min()
+
+
+# Formata só os meses distintos (strftime linha a linha domina o carregamento com muitos clientes)
+def new_customers_by_month(first_orders):
+    counts = first_orders.dt.to_period('M').value_counts().sort_index()
+    counts.index = counts.index.strftime('%Y-%m').rename(first_orders.name)
+    return counts
+
+
+# Clientes que compraram em cada categoria: uma linha por cliente, uma coluna por categoria
+def category_flags(items):
+    pairs = items[['customer_id', 'category']].drop_duplicates().astype({'category': object})
+    return pairs.assign(present=True).pivot(index='customer_id', columns='category', values='present') \
+                .notna().rename_axis(index='customer_id', columns='category')
+
+
+def combine_flags(frames):
+    index = reduce(lambda a, b: a.union(b), (f.index for f in frames))
+    columns = reduce(lambda a, b: a.union(b), (f.columns for f in frames))
+    return reduce(lambda a, b: a | b, (f.reindex(index=index, columns=columns, fill_value=False) for f in frames))
+
+
+# Resumo de um conjunto de pedidos (uma partição ou um lote)
+def summarize(orders, order_items, products):
+    items = order_items.merge(orders[['order_id', 'customer_id']], on='order_id') \
+                       .merge(products[['product_id', 'category']], on='product_id')
+    return Summary(
+        n_orders=len(orders),
+        statuses=frozenset(orders['status'].dropna().unique().tolist()),
+        last_order_date=orders['order_date'].max(),
+        first_orders=first_order_dates(orders),
+        product_revenue=(items['quantity'] * items['unit_price']).groupby(items['product_id']).sum(),
+        category_customers=category_flags(items),
+    )
+
+
+def combine_summaries(summaries):
+    return Summary(
+        n_orders=sum(s.n_orders for s in summaries),
+        statuses=frozenset().union(*(s.statuses for s in summaries)),
+        last_order_date=max((s.last_order_date for s in summaries if pd.notna(s.last_order_date)), default=pd.NaT),
+        first_orders=pd.concat([s.first_orders for s in summaries]).groupby(level=0).min(),
+        product_revenue=pd.concat([s.product_revenue for s in summaries]).groupby(level=0).sum(),
+        category_customers=combine_flags([s.category_customers for s in summaries]),
+    )
+
+
+# Agregados do RFM por cliente (ver rfm.py) somados entre partições
+def combine_aggregates(aggregates):
+    return pd.concat(aggregates).groupby(level=0).agg(
+        last_order=('last_order', 'max'), frequency=('frequency', 'sum'), monetary=('monetary', 'sum'))
+
+
+def _bounds(ids):
+    return [int(ids.min()), int(ids.max())] if len(ids) else None
+
+
+# Intervalos de IDs de uma partição: {'orders': [mín, máx], 'order_items': [mín, máx]}
+def id_range(orders, order_items):
+    return {'orders': _bounds(orders['order_id']), 'order_items': _bounds(order_items['order_item_id'])}
+
+
+def combine_id_ranges(first, second):
+    return {name: [min(first[name][0], second[name][0]), max(first[name][1], second[name][1])]
+            if first[name] and second[name] else first[name] or second[name]
+            for name in first}
+
+
+# Algum ID no intervalo [mín, máx]
+def in_range(ids, bounds):
+    return bounds is not None and bool(ids.between(*bounds).any())
+
+
+# Resumo, agregados do RFM e intervalos de IDs de partições (mês, orders, order_items),
+# uma partição por vez
+def summarize_partitions(partitions, products):
+    summaries, aggregates, id_ranges = [], [], {}
+    for month, orders, order_items in partitions:
+        summaries.append(summarize(orders, order_items, products))
+        aggregates.append(customer_aggregates(orders))
+        id_ranges[month] = id_range(orders, order_items)
+    return combine_summaries(summaries), combine_aggregates(aggregates), id_ranges
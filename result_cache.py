@@ -0,0 +1,113 @@
+# =============================================================================
+# CACHE DE RESULTADOS POR SELEÇÃO DE FILTROS
+# =============================================================================
+# Guarda os resultados das consultas do dashboard (KPIs, gráficos, RFM da
+# população filtrada) por uma chave canônica da seleção: a ordem dos valores
+# escolhidos em cada filtro não importa, e nenhum DataFrame entra no hash.
+# O cache é um só por processo, compartilhado entre as sessões, e limitado por
+# um orçamento de memória: quando passa do limite, saem os resultados usados há
+# mais tempo (LRU). Cada chave inclui a versão dos dados; quando a versão muda,
+# os resultados antigos são descartados. Os resultados são compartilhados entre
+# as sessões e não devem ser alterados por quem os recebe.
+
+import sys
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+DEFAULT_BUDGET_MB = 256
+
+
+# Forma canônica e hashável de uma chave: listas e conjuntos (valores escolhidos em um
+# filtro) viram tuplas ordenadas; tuplas mantêm a ordem (posição dos argumentos)
+def canonical(value):
+    if isinstance(value, dict):
+        return tuple(sorted((key, canonical(v)) for key, v in value.items()))
+    if isinstance(value, (list, set, frozenset)):
+        return tuple(sorted(canonical(v) for v in value))
+    if isinstance(value, tuple):
+        return tuple(canonical(v) for v in value)
+    return value
+
+
+# Memória ocupada por um resultado (DataFrames e Series pelo conteúdo, incluindo strings)
+def result_size(value):
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(result_size(v) for v in value)
+    return sys.getsizeof(value)
+
+
+class ResultCache:
+    def __init__(self, budget_mb=DEFAULT_BUDGET_MB):
+        self.budget = int(budget_mb * 2 ** 20)
+        self._entries = OrderedDict()
+        self._pending = {}
+        self._lock = threading.Lock()
+        self.version = None
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    # Descarta os resultados de outra versão dos dados (chamado com o lock)
+    def _set_version(self, version):
+        if version != self.version:
+            self._entries.clear()
+            self._pending.clear()
+            self.size = 0
+            self.version = version
+
+    def _store(self, key, value):
+        size = result_size(value)
+        if size > self.budget:
+            return
+        self._entries[key] = (value, size)
+        self.size += size
+        while self.size > self.budget:
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self.size -= evicted
+            self.evictions += 1
+
+    # Resultado da chave na versão dos dados; calcula com compute() se não estiver no cache.
+    # Sessões que pedem a mesma chave ao mesmo tempo esperam um único cálculo.
+    def get(self, version, key, compute):
+        key = canonical(key)
+        while True:
+            with self._lock:
+                self._set_version(version)
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return self._entries[key][0]
+                pending = self._pending.get(key)
+                if pending is None:
+                    pending = self._pending[key] = threading.Event()
+                    self.misses += 1
+                    break
+            pending.wait()
+            # Procura de novo: o resultado já está no cache, ou quem calculava falhou
+        value, computed = None, False
+        try:
+            value = compute()
+            computed = True
+        finally:
+            with self._lock:
+                if computed and self.version == version:
+                    self._store(key, value)
+                if self._pending.get(key) is pending:
+                    del self._pending[key]
+                pending.set()
+        return value
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'bytes': self.size, 'budget_bytes': self.budget,
+                    'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions}
@@ -0,0 +1,123 @@
+# =============================================================================
+# SEGMENTAÇÃO RFM (RECÊNCIA, FREQUÊNCIA, MONETÁRIO)
+# =============================================================================
+# Versão vetorizada da segmentação do notebook "3 - Análise_de_Dados.ipynb":
+# considera apenas pedidos entregues, pontua cada dimensão por quartis (1 a 4) e
+# classifica o RFM_score em VIP (>= 10), Regular (>= 7), Ocasional (>= 4) e Inativo.
+# O RFMModel guarda os agregados por cliente e os limites dos quartis; quando
+# chegam novos pedidos, só os clientes afetados são reagregados e repontuados.
+
+import numpy as np
+import pandas as pd
+
+SEGMENTS = ['VIP', 'Regular', 'Ocasional', 'Inativo']
+
+
+# Data de referência padrão: último dia nos dados + 1
+def default_reference_date(orders):
+    return orders['order_date'].max().normalize() + pd.Timedelta(days=1)
+
+
+# Última compra, frequência e valor total por cliente (pedidos entregues)
+def customer_aggregates(orders):
+    delivered = orders[orders['status'] == 'Entregue']
+    return delivered.groupby('customer_id').agg(
+        last_order=('order_date', 'max'),
+        frequency=('order_id', 'count'),
+        monetary=('total_amount', 'sum'),
+    )
+
+
+# Limites dos quartis (como pd.qcut com duplicates='drop'); sempre ao menos um intervalo
+def quartile_edges(values):
+    if len(values) == 0:
+        return np.zeros(2)
+    edges = np.unique(np.quantile(values, [0, 0.25, 0.5, 0.75, 1]))
+    return edges if len(edges) > 1 else np.repeat(edges, 2)
+
+
+# Índice do quartil (0 = menor) de cada valor, com intervalos fechados à direita
+def quartile_bins(values, edges):
+    return np.clip(np.searchsorted(edges, values, side='left') - 1, 0, len(edges) - 2)
+
+
+def segment_scores(rfm_score):
+    return np.select([rfm_score >= 10, rfm_score >= 7, rfm_score >= 4], SEGMENTS[:3], SEGMENTS[3])
+
+
+class RFMModel:
+    def __init__(self, orders, customers, reference_date=None):
+        self.reference_date = pd.Timestamp(reference_date) if reference_date is not None \
+            else default_reference_date(orders)
+        self.names = customers.set_index('customer_id')['customer_name']
+        self.aggregates = customer_aggregates(orders)
+        self.rescore()
+
+    # Modelo a partir de agregados já calculados (ex.: combinados partição a partição)
+    @classmethod
+    def from_aggregates(cls, aggregates, customers, reference_date):
+        model = cls.__new__(cls)
+        model.reference_date = pd.Timestamp(reference_date)
+        model.names = customers.set_index('customer_id')['customer_name']
+        model.aggregates = aggregates
+        model.rescore()
+        return model
+
+    def _score(self, aggregates):
+        recency = (self.reference_date - aggregates['last_order']).dt.days.to_numpy()
+        frequency = aggregates['frequency'].to_numpy()
+        monetary = aggregates['monetary'].to_numpy()
+        # Menor recência = melhor; maior frequência e monetário = melhor
+        r_bins = quartile_bins(recency, self.edges['recency'])
+        r_score = len(self.edges['recency']) - 1 - r_bins
+        f_score = quartile_bins(frequency, self.edges['frequency']) + 1
+        m_score = quartile_bins(monetary, self.edges['monetary']) + 1
+        rfm_score = r_score + f_score + m_score
+        scored = pd.DataFrame({
+            'customer_id': aggregates.index.to_numpy(),
+            'recency': recency,
+            'frequency': frequency,
+            'monetary': monetary,
+            'customer_name': self.names.reindex(aggregates.index).to_numpy(),
+            'R_score': r_score,
+            'F_score': f_score,
+            'M_score': m_score,
+            'RFM_score': rfm_score,
+            'segment': pd.Categorical(segment_scores(rfm_score), categories=sorted(SEGMENTS)),
+        })
+        # Clientes sem cadastro ficam de fora, como no merge do notebook
+        return scored[scored['customer_name'].notna()]
+
+    # Recalcula os limites dos quartis e pontua todos os clientes
+    def rescore(self):
+        recency = (self.reference_date - self.aggregates['last_order']).dt.days
+        self.edges = {
+            'recency': quartile_edges(recency),
+            'frequency': quartile_edges(self.aggregates['frequency']),
+            'monetary': quartile_edges(self.aggregates['monetary']),
+        }
+        self.table = self._score(self.aggregates).reset_index(drop=True)
+        return self.table
+
+    # Incorpora novos pedidos: reagrega e repontua apenas os clientes afetados,
+    # mantendo os limites dos quartis (use rescore() para recalculá-los)
+    def update(self, new_orders):
+        delta = customer_aggregates(new_orders)
+        if delta.empty:
+            return self.table
+        current = self.aggregates.reindex(delta.index)
+        merged = pd.DataFrame({
+            'last_order': pd.concat([current['last_order'], delta['last_order']], axis=1).max(axis=1),
+            'frequency': current['frequency'].fillna(0).astype(np.int64) + delta['frequency'],
+            'monetary': current['monetary'].fillna(0) + delta['monetary'],
+        })
+        self.aggregates = pd.concat([self.aggregates.drop(delta.index, errors='ignore'), merged]).sort_index()
+        affected = self._score(merged)
+        self.table = pd.concat([self.table[~self.table['customer_id'].isin(delta.index)], affected]) \
+                       .sort_values('customer_id').reset_index(drop=True)
+        return self.table
+
+
+# RFM de uma população de pedidos (ex.: apenas clientes de SP)
+def compute_rfm(orders, customers, reference_date=None):
+    return RFMModel(orders, customers, reference_date).table
@@ -0,0 +1,92 @@
+# =============================================================================
+# ÍNDICE DA TABELA RFM (CONSULTAS POR FAIXA, BUSCA, ORDENAÇÃO E PÁGINAS)
+# =============================================================================
+# Mantém, para recency, frequency e monetary, os valores ordenados e a ordem
+# das linhas da tabela RFM. Uma consulta com as três faixas dos sliders:
+#   1. acha por busca binária (searchsorted) o intervalo de cada faixa;
+#   2. parte do intervalo mais estreito e confere as outras duas faixas só
+#      nessas linhas (interseção dos intervalos);
+#   3. aplica a busca por nome do cliente (sem diferenciar maiúsculas) e ordena
+#      o resultado (pela ordem já indexada, nas colunas indexadas).
+# O dashboard recebe só a página pedida e, quando o usuário pede, o CSV do
+# resultado completo gerado em blocos.
+
+import io
+
+import numpy as np
+import pandas as pd
+
+INDEXED_COLUMNS = ['recency', 'frequency', 'monetary']
+CSV_CHUNK_ROWS = 10_000
+
+
+class RFMIndex:
+    def __init__(self, rfm):
+        self.rfm = rfm
+        self.values = {c: rfm[c].to_numpy() for c in INDEXED_COLUMNS}
+        self.order = {c: np.argsort(values, kind='stable') for c, values in self.values.items()}
+        self.sorted_values = {c: self.values[c][self.order[c]] for c in INDEXED_COLUMNS}
+        self.names = rfm['customer_name'].astype(str).str.lower().to_numpy(dtype=object)
+
+    def __len__(self):
+        return len(self.rfm)
+
+    # Memória dos índices (a tabela RFM em si é contada onde é guardada)
+    def __sizeof__(self):
+        arrays = list(self.values.values()) + list(self.order.values()) + list(self.sorted_values.values())
+        return sum(a.nbytes for a in arrays) + int(pd.Series(self.names).memory_usage(deep=True))
+
+    # Menor e maior valor de uma coluna indexada (tabela não vazia)
+    def bounds(self, column):
+        sorted_values = self.sorted_values[column]
+        return sorted_values[0], sorted_values[-1]
+
+    # Posições das linhas com low <= coluna <= high (busca binária no índice da coluna)
+    def range_rows(self, column, low, high):
+        sorted_values = self.sorted_values[column]
+        start = np.searchsorted(sorted_values, low, side='left')
+        end = np.searchsorted(sorted_values, high, side='right')
+        return self.order[column][start:end]
+
+    # Posições das linhas que passam nas faixas e na busca, na ordem pedida.
+    # ranges: {coluna: (mínimo, máximo)} com colunas de INDEXED_COLUMNS.
+    def query(self, ranges, search='', sort_by=None, ascending=True):
+        intervals = {column: self.range_rows(column, *limits) for column, limits in ranges.items()}
+        candidates = None
+        for column in sorted(intervals, key=lambda c: len(intervals[c])):
+            if candidates is None:
+                candidates = intervals[column]
+            else:
+                low, high = ranges[column]
+                values = self.values[column][candidates]
+                candidates = candidates[(values >= low) & (values <= high)]
+        if candidates is None:
+            candidates = np.arange(len(self.rfm))
+        search = search.strip().lower()
+        if search:
+            names = pd.Series(self.names[candidates], dtype=object)
+            candidates = candidates[names.str.contains(search, regex=False).to_numpy()]
+
+        if sort_by is None:
+            return np.sort(candidates)
+        if sort_by in self.order:
+            # Percorre a ordem já indexada e mantém só as linhas selecionadas
+            selected = np.zeros(len(self.rfm), dtype=bool)
+            selected[candidates] = True
+            ordered = self.order[sort_by][selected[self.order[sort_by]]]
+        else:
+            candidates = np.sort(candidates)
+            values = self.rfm[sort_by].to_numpy()[candidates]
+            ordered = candidates[np.argsort(values, kind='stable')]
+        return ordered if ascending else ordered[::-1]
+
+    def page(self, positions, number, size):
+        start = (number - 1) * size
+        return self.rfm.iloc[positions[start:start + size]]
+
+    # CSV das linhas selecionadas, em blocos de texto (cabeçalho no primeiro)
+    def csv_chunks(self, positions, chunk_rows=CSV_CHUNK_ROWS):
+        for start in range(0, max(len(positions), 1), chunk_rows):
+            buffer = io.StringIO()
+            self.rfm.iloc[positions[start:start + chunk_rows]].to_csv(buffer, index=False, header=start == 0)
+            yield buffer.getvalue()
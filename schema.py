@@ -0,0 +1,112 @@
+# =============================================================================
+# ESQUEMA DAS TABELAS (create_tables.sql)
+# =============================================================================
+# Lê as definições CREATE TABLE de Ecommerce_Dataset/create_tables.sql (tipos,
+# chaves primárias e estrangeiras) e valida/tipa DataFrames contra elas.
+
+import re
+from collections import namedtuple
+
+import pandas as pd
+
+Column = namedtuple('Column', ['name', 'type', 'params'])
+Table = namedtuple('Table', ['name', 'columns', 'primary_key', 'foreign_keys'])
+
+_TABLE_RE = re.compile(r'CREATE TABLE\s+(\w+)\s*\((.*?)\)\s*;', re.S | re.I)
+_COLUMN_RE = re.compile(r'(\w+)\s+(\w+)(?:\s*\(([\d\s,]+)\))?(.*)', re.S)
+_FOREIGN_KEY_RE = re.compile(r'FOREIGN KEY\s*\((\w+)\)\s*REFERENCES\s+(\w+)\s*\((\w+)\)', re.I)
+_PRIMARY_KEY_RE = re.compile(r'PRIMARY KEY\s*\((\w+)\)', re.I)
+
+
+class SchemaError(ValueError):
+    pass
+
+
+# Separa as definições do corpo do CREATE TABLE (vírgulas fora de parênteses)
+def _split_definitions(body):
+    parts, depth, current = [], 0, ''
+    for char in body:
+        if char == ',' and depth == 0:
+            parts.append(current.strip())
+            current = ''
+            continue
+        depth += (char == '(') - (char == ')')
+        current += char
+    parts.append(current.strip())
+    return [p for p in parts if p]
+
+
+def parse_schema(sql):
+    sql = re.sub(r'--[^\n]*', '', sql)
+    tables = {}
+    for name, body in _TABLE_RE.findall(sql):
+        columns, primary_key, foreign_keys = {}, None, {}
+        for definition in _split_definitions(body):
+            if definition.upper().startswith('FOREIGN KEY'):
+                column, ref_table, ref_column = _FOREIGN_KEY_RE.match(definition).groups()
+                foreign_keys[column] = (ref_table, ref_column)
+            elif definition.upper().startswith('PRIMARY KEY'):
+                primary_key = _PRIMARY_KEY_RE.match(definition).group(1)
+            else:
+                column, col_type, params, rest = _COLUMN_RE.match(definition).groups()
+                params = tuple(int(p) for p in params.split(',')) if params else ()
+                columns[column] = Column(column, col_type.upper(), params)
+                if 'PRIMARY KEY' in rest.upper():
+                    primary_key = column
+        tables[name] = Table(name, columns, primary_key, foreign_keys)
+    return tables
+
+
+def load_schema(path):
+    with open(path, encoding='utf-8') as f:
+        return parse_schema(f.read())
+
+
+# Apenas os comandos CREATE TABLE (sem CREATE DATABASE/USE, que são do MySQL)
+def create_table_statements(sql):
+    sql = re.sub(r'--[^\n]*', '', sql)
+    return [match.group(0) for match in _TABLE_RE.finditer(sql)]
+
+
+# Converte e valida um DataFrame contra a definição da tabela (sem nulos).
+# Levanta SchemaError com todos os problemas encontrados.
+def coerce(df, table):
+    problems = []
+    missing = [c for c in table.columns if c not in df.columns]
+    extra = [c for c in df.columns if c not in table.columns]
+    if missing:
+        problems.append(f"colunas ausentes: {', '.join(missing)}")
+    if extra:
+        problems.append(f"colunas desconhecidas: {', '.join(extra)}")
+    if problems:
+        raise SchemaError(f"{table.name}: " + '; '.join(problems))
+
+    typed = pd.DataFrame(index=df.index)
+    for column in table.columns.values():
+        values = df[column.name]
+        if column.type in ('INT', 'INTEGER', 'BIGINT'):
+            converted = pd.to_numeric(values, errors='coerce')
+            invalid = converted.isna() | (converted != converted.round())
+            converted = converted.where(~invalid, 0).astype('int64')
+        elif column.type == 'DATE':
+            converted = pd.to_datetime(values, format='%Y-%m-%d', errors='coerce')
+            invalid = converted.isna()
+        elif column.type in ('DECIMAL', 'NUMERIC'):
+            precision, scale = column.params if len(column.params) == 2 else ((column.params or (10,))[0], 0)
+            converted = pd.to_numeric(values, errors='coerce').round(scale)
+            invalid = converted.isna() | (converted.abs() >= 10 ** (precision - scale))
+        else:
+            converted = values.astype('string')
+            invalid = values.isna()
+            if column.params:
+                invalid |= (converted.str.len() > column.params[0]).fillna(False).astype(bool)
+            converted = converted.astype(object)
+        if invalid.any():
+            problems.append(f"{column.name} ({column.type}): {int(invalid.sum())} valores inválidos")
+        typed[column.name] = converted
+
+    if table.primary_key and typed[table.primary_key].duplicated().any():
+        problems.append(f"{table.primary_key}: chave primária duplicada")
+    if problems:
+        raise SchemaError(f"{table.name}: " + '; '.join(problems))
+    return typed
@@ -0,0 +1,237 @@
+# =============================================================================
+# DADOS COMPARTILHADOS ENTRE PROCESSOS (UM CARREGADOR, VÁRIOS WORKERS)
+# =============================================================================
+# Com vários processos do dashboard, cada um carregaria e prepararia sua própria
+# cópia dos dados. Neste modo um único processo carregador (python shared_dataset.py)
+# monta o estado do backend em memória e publica, em Ecommerce_Dataset/_shared/:
+#   - as tabelas já preparadas (products, customers, RFM e, por mês, orders,
+#     order_items e a tabela fato) em arquivos Arrow IPC sem compressão;
+#   - as estruturas derivadas (motor de filtros e cubo de cada mês, agregados
+#     globais) em pickle com os arrays NumPy fora do pickle, em um arquivo .buffers;
+#   - o shared.json, com o diretório e o número da versão publicada.
+# Os workers (DASHBOARD_SHARED=1) mapeiam os arquivos em memória (memory_map/mmap)
+# e montam DataFrames e arrays sobre os buffers mapeados, sem copiar: as páginas
+# são do cache de arquivos do sistema, compartilhadas entre todos os processos, e
+# somente leitura. Nenhum worker lê CSVs nem monta índices.
+# Cada publicação é uma nova versão em outro diretório; o shared.json é trocado de
+# forma atômica e os workers passam para a versão nova na próxima interação
+# (a versão entra na chave do cache de resultados). A versão anterior é mantida
+# para workers que ainda carregam partições dela.
+# Para publicar: python shared_dataset.py [caminho_do_Ecommerce_Dataset] [--watch SEGUNDOS]
+
+import argparse
+import json
+import logging
+import mmap
+import os
+import pickle
+import shutil
+import threading
+import time
+
+import pandas as pd
+import pyarrow as pa
+from pyarrow import feather
+
+from compact import format_sizes, resident_size
+from ingestion import Dataset, DatasetState, Partition
+from schema import load_schema
+from snapshot import PARTITIONED_TABLES, write_json
+
+SHARED_DIR = "_shared"
+MANIFEST_FILE = "shared.json"
+SHARED_TABLES = ['products', 'customers', 'rfm']
+PARTITION_TABLES = PARTITIONED_TABLES + ['fact']
+BUFFER_ALIGNMENT = 64
+
+logger = logging.getLogger("dashboard.memory")
+
+# Strings do Arrow continuam no buffer mapeado (string[pyarrow]) em vez de virar objetos Python
+_TYPES = {pa.string(): pd.StringDtype('pyarrow'), pa.large_string(): pd.StringDtype('pyarrow')}
+
+
+def shared_path(base_path, *parts):
+    return os.path.join(base_path, SHARED_DIR, *parts)
+
+
+def read_manifest(base_path):
+    path = shared_path(base_path, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+# Arquivo de uma versão: global (month=None) ou de uma partição mensal
+def version_path(base_path, manifest, name, month=None):
+    return shared_path(base_path, manifest['directory'], *([month] if month else []), name)
+
+
+# Um único bloco (chunk) por coluna: colunas em vários blocos teriam de ser concatenadas (copiadas)
+def write_table(df, path):
+    feather.write_feather(df.reset_index(drop=True), f"{path}.arrow", compression='uncompressed',
+                          chunksize=max(len(df), 1))
+
+
+# DataFrame sobre o arquivo mapeado em memória: colunas numéricas, datas e códigos de
+# categorias apontam para os buffers do Arrow (só os dicionários das categorias são copiados)
+def map_table(path):
+    return feather.read_table(f"{path}.arrow", memory_map=True) \
+                  .to_pandas(split_blocks=True, types_mapper=_TYPES.get)
+
+
+# Pickle (protocolo 5) com os buffers dos arrays gravados à parte, alinhados, em <path>.buffers
+def write_objects(obj, path):
+    buffers = []
+    data = pickle.dumps(obj, protocol=5, buffer_callback=buffers.append)
+    layout = []
+    with open(f"{path}.buffers", 'wb') as f:
+        for buffer in buffers:
+            raw = buffer.raw()
+            f.write(b'\0' * (-f.tell() % BUFFER_ALIGNMENT))
+            layout.append((f.tell(), raw.nbytes))
+            f.write(raw)
+    with open(f"{path}.pickle", 'wb') as f:
+        pickle.dump((layout, data), f, protocol=5)
+
+
+# Objetos gravados por write_objects, com os arrays apontando para o arquivo mapeado
+def map_objects(path):
+    with open(f"{path}.pickle", 'rb') as f:
+        layout, data = pickle.load(f)
+    with open(f"{path}.buffers", 'rb') as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(f.fileno()).st_size else b''
+    view = memoryview(mapped)
+    return pickle.loads(data, buffers=[view[offset:offset + size] for offset, size in layout])
+
+
+# Publica o estado atual como uma nova versão e remove as versões mais antigas que a anterior
+def publish(base_path, state, rejected=None):
+    previous = read_manifest(base_path)
+    version = previous['version'] + 1 if previous else 1
+    manifest = {'directory': f"version-{version}-{time.time_ns()}", 'version': version,
+                'months': list(state.months), 'rejected': dict(rejected or {}), 'sizes': {}}
+    os.makedirs(shared_path(base_path, manifest['directory']))
+    for name, df in (('products', state.products), ('customers', state.customers), ('rfm', state.rfm)):
+        write_table(df, version_path(base_path, manifest, name))
+    write_objects({'summary': state.summary, 'new_customers_monthly': state.new_customers_monthly},
+                  version_path(base_path, manifest, 'state'))
+    for partition in state.select_partitions(state.months):
+        os.makedirs(shared_path(base_path, manifest['directory'], partition.month))
+        for name, df in zip(PARTITION_TABLES, (partition.orders, partition.order_items, partition.fact)):
+            write_table(df, version_path(base_path, manifest, name, partition.month))
+        write_objects((partition.filter_engine, partition.cube),
+                      version_path(base_path, manifest, 'indices', partition.month))
+        manifest['sizes'][partition.month] = partition.size
+
+    write_json(manifest, shared_path(base_path, MANIFEST_FILE))
+    keep = {manifest['directory'], previous['directory'] if previous else None}
+    for entry in os.scandir(shared_path(base_path)):
+        if entry.is_dir() and entry.name.startswith('version-') and entry.name not in keep:
+            shutil.rmtree(entry.path, ignore_errors=True)
+    return manifest
+
+
+# Estado de uma versão publicada: tudo mapeado em memória, partições mapeadas no primeiro uso.
+# Os arrays mapeados são somente leitura: o estado não incorpora lotes (papel do carregador).
+class SharedState(DatasetState):
+    def __init__(self, base_path, manifest, memory_budget=None):
+        self.base_path = base_path
+        self.manifest = manifest
+        self.version = manifest['version']
+        self.memory_budget = memory_budget
+        self.months = list(manifest['months'])
+        self.partitions = {}
+        self.pending = {}
+        self.refused = {}
+        self._lock = threading.Lock()
+        self.products, self.customers, self._rfm = (map_table(version_path(base_path, manifest, name))
+                                                    for name in SHARED_TABLES)
+        aggregates = map_objects(version_path(base_path, manifest, 'state'))
+        self.summary = aggregates['summary']
+        self.new_customers_monthly = aggregates['new_customers_monthly']
+        self.base_sizes = self._base_sizes()
+        self.check_budget(0, "os dados")
+
+    @property
+    def rfm(self):
+        return self._rfm
+
+    def _base_sizes(self):
+        return {'products': resident_size(self.products), 'customers': resident_size(self.customers),
+                'resumo': resident_size(self.summary), 'rfm': resident_size(self._rfm)}
+
+    # Tamanho medido pelo carregador ao publicar a partição
+    def estimated_size(self, month):
+        return self.manifest['sizes'][month]
+
+    def build_partition(self, month):
+        tables = [map_table(version_path(self.base_path, self.manifest, name, month)) for name in PARTITION_TABLES]
+        indices = map_objects(version_path(self.base_path, self.manifest, 'indices', month))
+        return Partition.from_parts(month, *tables, *indices)
+
+
+# Mesma interface do Dataset (ingestion.py) para os workers: refresh() troca para a
+# versão publicada mais recente, sem ler os lotes de incoming/
+class SharedDataset:
+    def __init__(self, base_path, memory_budget_mb=None):
+        self.base_path = base_path
+        self.schema = load_schema(os.path.join(base_path, 'create_tables.sql'))
+        self.memory_budget = memory_budget_mb * 2 ** 20 if memory_budget_mb else None
+        self._stamp = None
+        self._lock = threading.Lock()
+        self.state = None
+        self.refresh()
+        if self.state is None:
+            raise FileNotFoundError(f"Nenhuma versão publicada em {shared_path(base_path)}: "
+                                    f"execute python shared_dataset.py {base_path}")
+
+    @property
+    def version(self):
+        return self.state.version
+
+    # Lotes rejeitados pelo carregador na versão atual
+    @property
+    def rejected(self):
+        return self.state.manifest['rejected']
+
+    # Passa para a versão publicada mais recente (só relê o shared.json quando ele muda)
+    def refresh(self):
+        try:
+            stamp = os.stat(shared_path(self.base_path, MANIFEST_FILE)).st_mtime_ns
+        except FileNotFoundError:
+            return self.state
+        if stamp == self._stamp:
+            return self.state
+        with self._lock:
+            manifest = read_manifest(self.base_path)
+            if self.state is None or manifest['version'] != self.state.version:
+                self.state = SharedState(self.base_path, manifest, self.memory_budget)
+                logger.info("Versão %s dos dados compartilhados mapeada: %s", manifest['version'],
+                            format_sizes(self.state.memory_usage()))
+            self._stamp = stamp
+        return self.state
+
+
+# Carregador: publica o estado e, com --watch, republica quando um lote novo é processado
+def run_loader(base_path, watch=None):
+    dataset = Dataset(base_path, compact=True)
+    while True:
+        manifest = publish(base_path, dataset.state, dataset.rejected)
+        print(f"Versão {manifest['version']} publicada em {shared_path(base_path, manifest['directory'])}")
+        if watch is None:
+            return manifest
+        published = (dataset.version, dict(dataset.rejected))
+        while (dataset.version, dataset.rejected) == published:
+            time.sleep(watch)
+            dataset.refresh()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Publica os dados preparados para os workers do dashboard.")
+    parser.add_argument("base_path", nargs='?',
+                        default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "Ecommerce_Dataset"))
+    parser.add_argument("--watch", type=float, metavar="SEGUNDOS",
+                        help="continua rodando e publica uma nova versão quando chegam lotes em incoming/")
+    args = parser.parse_args()
+    run_loader(args.base_path, args.watch)
@@ -0,0 +1,88 @@
+# =============================================================================
+# SKETCHES HYPERLOGLOG PARA CONTAGEM APROXIMADA DE CLIENTES ÚNICOS
+# =============================================================================
+# Contagens distintas não podem ser somadas entre células do cubo, mas sketches
+# HyperLogLog podem ser combinados (máximo registrador a registrador). Cada célula
+# do cubo guarda um HLL esparso dos customer_id das suas linhas: apenas os pares
+# (registrador, rank) não nulos. Uma seleção de filtros combina os sketches das
+# células selecionadas e estima a contagem.
+# Erro padrão relativo ≈ 1,04 / sqrt(2 ** precision): ±1,6% com precision=12,
+# ou seja, ~95% das estimativas ficam dentro de ±3,3% do valor exato.
+
+import numpy as np
+
+DEFAULT_PRECISION = 12
+_RANK_BITS = 52
+
+
+# Hash de 64 bits (splitmix64) vetorizado sobre inteiros
+def hash64(values):
+    with np.errstate(over='ignore'):
+        z = values.astype(np.uint64) + np.uint64(0x9E3779B97F4A7C15)
+        z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        return z ^ (z >> np.uint64(31))
+
+
+# Registrador (bits altos do hash) e rank (posição do primeiro bit 1 nos bits baixos)
+def registers_and_ranks(values, precision):
+    h = hash64(values)
+    registers = (h >> np.uint64(64 - precision)).astype(np.int64)
+    rest = (h & np.uint64((1 << _RANK_BITS) - 1)).astype(np.float64)
+    # frexp devolve o bit_length exato para inteiros < 2**53
+    ranks = (_RANK_BITS + 1 - np.frexp(rest)[1]).astype(np.uint8)
+    return registers, ranks
+
+
+# Estimativa HLL (com correção de linear counting para cardinalidades pequenas)
+def estimate(registers):
+    m = registers.shape[-1]
+    alpha = 0.7213 / (1 + 1.079 / m)
+    raw = alpha * m * m / np.sum(np.exp2(-registers.astype(np.float64)), axis=-1)
+    zeros = np.count_nonzero(registers == 0, axis=-1)
+    linear = m * np.log(m / np.maximum(zeros, 1))
+    return np.where((raw <= 2.5 * m) & (zeros > 0), linear, raw)
+
+
+class CellSketches:
+    def __init__(self, precision=DEFAULT_PRECISION):
+        if not 4 <= precision <= 64 - _RANK_BITS:
+            raise ValueError(f"precision deve estar entre 4 e {64 - _RANK_BITS}")
+        self.precision = precision
+        self.m = 1 << precision
+        self.cells = np.empty(0, dtype=np.int64)
+        self.registers = np.empty(0, dtype=np.int64)
+        self.ranks = np.empty(0, dtype=np.uint8)
+
+    # Mantém só o maior rank de cada par (célula, registrador)
+    def _reduce(self, keys, ranks):
+        keys, inverse = np.unique(keys, return_inverse=True)
+        self.ranks = np.zeros(len(keys), dtype=np.uint8)
+        np.maximum.at(self.ranks, inverse, ranks)
+        self.cells = keys // self.m
+        self.registers = keys % self.m
+
+    # Acrescenta customer_id às células indicadas (uma célula por valor)
+    def add(self, cells, values):
+        registers, ranks = registers_and_ranks(values, self.precision)
+        keys = np.concatenate([self.cells * self.m + self.registers, cells.astype(np.int64) * self.m + registers])
+        self._reduce(keys, np.concatenate([self.ranks, ranks]))
+
+    # HLL não permite remover valores: as células afetadas são esvaziadas e reconstruídas
+    def replace(self, cleared_cells, cells, values):
+        kept = ~np.isin(self.cells, cleared_cells)
+        self.cells, self.registers, self.ranks = self.cells[kept], self.registers[kept], self.ranks[kept]
+        self.add(cells, values)
+
+    # Combina os sketches das células selecionadas (opcionalmente por grupo):
+    # um vetor de registradores por grupo, que ainda pode ser combinado com outros
+    def merge(self, keep, groups=None, n_groups=1):
+        selected = keep[self.cells]
+        cells = self.cells[selected]
+        group = groups[cells] if groups is not None else np.zeros(len(cells), dtype=np.int64)
+        registers = np.zeros((n_groups, self.m), dtype=np.uint8)
+        np.maximum.at(registers, (group, self.registers[selected]), self.ranks[selected])
+        return registers
+
+    def estimate(self, keep, groups=None, n_groups=1):
+        return estimate(self.merge(keep, groups, n_groups))
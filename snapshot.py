@@ -0,0 +1,323 @@
+# =============================================================================
+# SNAPSHOT COLUNAR DO ECOMMERCE_DATASET
+# =============================================================================
+# Converte os CSVs do Ecommerce_Dataset em arquivos Feather (Arrow IPC) já tipados:
+# datas convertidas para datetime64 e strings de baixa cardinalidade codificadas
+# como dicionário (dtype category). O dashboard lê o snapshot quando ele existe,
+# volta para o CSV quando não existe e reconstrói o arquivo quando o CSV é mais novo.
+# orders e order_items são particionados pelo mês do pedido (os itens ficam na
+# partição do seu pedido), um arquivo por mês em _snapshot/partitions-<geração>/.
+# Cada geração guarda também o resumo das partições (summary.pickle, ver
+# partition_summary.py), lido no carregamento em vez das partições, e o
+# partitions.json registra as linhas e o intervalo de IDs de cada mês.
+# O partitions.json aponta a geração atual e é trocado de forma atômica; a geração
+# anterior é mantida para processos que ainda carregam partições sob demanda dela.
+# Vários processos podem reconstruir as partições ao mesmo tempo: cada um grava a
+# própria geração (o nome leva o time_ns), só publica se ela for mais nova que a
+# publicada e só remove gerações mais antigas que a que substituiu. Um processo que
+# não encontra a geração publicada (ou uma partição dela) volta para os CSVs.
+# Para gerar o snapshot: python snapshot.py [caminho_do_Ecommerce_Dataset]
+
+import json
+import os
+import pickle
+import shutil
+import sys
+import time
+import uuid
+
+import pandas as pd
+from pyarrow import feather
+
+from compact import compact_table
+from partition_summary import summarize_partitions
+
+SNAPSHOT_DIR = "_snapshot"
+MANIFEST_FILE = "partitions.json"
+SUMMARY_FILE = "summary.pickle"
+PARTITIONED_TABLES = ['orders', 'order_items']
+
+# Tipagem de cada tabela: colunas de data e colunas codificadas como dicionário
+TABLE_SCHEMAS = {
+    'customers': {'dates': ['registration_date'], 'categories': ['state']},
+    'products': {'dates': [], 'categories': ['category', 'brand']},
+    'orders': {'dates': ['order_date'], 'categories': ['status']},
+    'order_items': {'dates': [], 'categories': []},
+}
+
+
+def csv_path(base_path, name):
+    return os.path.join(base_path, f"{name}.csv")
+
+
+def snapshot_path(base_path, name):
+    return os.path.join(base_path, SNAPSHOT_DIR, f"{name}.feather")
+
+
+# Aplica a tipagem do snapshot a um DataFrame lido do CSV
+def apply_schema(df, name):
+    schema = TABLE_SCHEMAS[name]
+    for col in schema['dates']:
+        df[col] = pd.to_datetime(df[col])
+    for col in schema['categories']:
+        df[col] = df[col].astype('category')
+    return df
+
+
+def read_csv(base_path, name):
+    return apply_schema(pd.read_csv(csv_path(base_path, name)), name)
+
+
+# O snapshot está desatualizado quando o CSV foi modificado depois dele
+def is_stale(base_path, name):
+    path = snapshot_path(base_path, name)
+    if not os.path.exists(path):
+        return True
+    return os.path.getmtime(csv_path(base_path, name)) > os.path.getmtime(path)
+
+
+# Grava um arquivo de forma atômica: write(tmp_path) escreve em um arquivo temporário
+# exclusivo deste processo, no mesmo diretório, que é então renomeado para path.
+# Processos que reconstroem o mesmo arquivo ao mesmo tempo não usam o mesmo
+# temporário, e o temporário de um processo nunca é removido por outro.
+def atomic_write(path, write):
+    tmp_path = f"{path}.{os.getpid()}-{uuid.uuid4().hex}.tmp"
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def write_json(obj, path):
+    def write(tmp_path):
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(obj, f)
+    atomic_write(path, write)
+
+
+# Escreve o snapshot de forma atômica (arquivo temporário + rename)
+def write_snapshot(df, base_path, name):
+    path = snapshot_path(base_path, name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    atomic_write(path, df.reset_index(drop=True).to_feather)
+
+
+# Concatena tabelas unindo as categorias das colunas categóricas
+def concat_tables(*frames):
+    first = frames[0]
+    columns = {}
+    for col in first.columns:
+        if isinstance(first[col].dtype, pd.CategoricalDtype):
+            cats = [df[col].astype('category') for df in frames]
+            categories = cats[0].cat.categories
+            for cat in cats[1:]:
+                categories = categories.union(cat.cat.categories)
+            columns[col] = [cat.cat.set_categories(categories) for cat in cats]
+    return pd.concat([df.assign(**{col: values[i] for col, values in columns.items()})
+                      for i, df in enumerate(frames)], ignore_index=True)
+
+
+# Mês (YYYY-MM) de cada pedido: chave das partições
+def order_months(orders):
+    return orders['order_date'].dt.strftime('%Y-%m')
+
+
+# Divide orders e order_items por mês do pedido. Itens de pedidos inexistentes
+# ficam de fora, como no join da tabela fato.
+def split_by_month(orders, order_items):
+    months = order_months(orders)
+    item_months = order_items['order_id'].map(pd.Series(months.to_numpy(), index=orders['order_id'].to_numpy()))
+    items_by_month = dict(tuple(order_items.groupby(item_months.to_numpy())))
+    empty_items = order_items.iloc[0:0]
+    return {month: (month_orders.reset_index(drop=True),
+                    items_by_month.get(month, empty_items).reset_index(drop=True))
+            for month, month_orders in orders.groupby(months.to_numpy())}
+
+
+def manifest_path(base_path):
+    return os.path.join(base_path, SNAPSHOT_DIR, MANIFEST_FILE)
+
+
+def read_manifest(base_path):
+    path = manifest_path(base_path)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+# As partições estão desatualizadas quando orders.csv ou order_items.csv é mais novo
+# (ou products.csv, de onde vêm as categorias do resumo)
+def partitions_stale(base_path):
+    path = manifest_path(base_path)
+    if not os.path.exists(path):
+        return True
+    built = os.path.getmtime(path)
+    return any(os.path.getmtime(csv_path(base_path, name)) > built for name in PARTITIONED_TABLES + ['products'])
+
+
+def partition_path(base_path, manifest, name, month):
+    return os.path.join(base_path, SNAPSHOT_DIR, manifest['directory'], name, f"{month}.feather")
+
+
+def summary_path(base_path, manifest):
+    return os.path.join(base_path, SNAPSHOT_DIR, manifest['directory'], SUMMARY_FILE)
+
+
+# Momento (time_ns) em que a geração foi criada, pelo nome da pasta
+def generation(directory):
+    return int(directory.rsplit('-', 1)[1])
+
+
+# Grava uma nova geração de partições e o resumo delas e publica o manifesto, a menos
+# que outro processo já tenha publicado uma geração mais nova (que é devolvida).
+# Remove só as gerações mais antigas que a substituída: a substituída continua para
+# quem ainda a usa, e as mais novas podem ser de processos que ainda estão gravando.
+def write_partitions(orders, order_items, products, base_path):
+    snapshot_dir = os.path.join(base_path, SNAPSHOT_DIR)
+    directory = f"partitions-{time.time_ns()}"
+    rows = {name: {} for name in PARTITIONED_TABLES}
+    partitions = split_by_month(orders, order_items)
+    manifest = {'directory': directory, 'months': sorted(partitions), 'rows': rows}
+    try:
+        for month, tables in partitions.items():
+            for name, df in zip(PARTITIONED_TABLES, tables):
+                path = partition_path(base_path, manifest, name, month)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                df.to_feather(path)
+                rows[name][month] = len(df)
+        summary, aggregates, manifest['ids'] = summarize_partitions(
+            ((month, *tables) for month, tables in partitions.items()), products)
+        with open(summary_path(base_path, manifest), 'wb') as f:
+            pickle.dump((summary, aggregates), f, protocol=pickle.HIGHEST_PROTOCOL)
+    except OSError:
+        # A pasta pode ter sido removida por um processo que publicou uma geração mais nova
+        current = read_manifest(base_path)
+        if current is not None and generation(current['directory']) > generation(directory):
+            return current
+        raise
+
+    replaced = read_manifest(base_path)
+    if replaced is not None and generation(replaced['directory']) > generation(directory):
+        shutil.rmtree(os.path.join(snapshot_dir, directory), ignore_errors=True)
+        return replaced
+    write_json(manifest, manifest_path(base_path))
+    if replaced is not None:
+        for entry in os.scandir(snapshot_dir):
+            if entry.is_dir() and entry.name.startswith('partitions-') \
+                    and generation(entry.name) < generation(replaced['directory']):
+                shutil.rmtree(entry.path, ignore_errors=True)
+    return manifest
+
+
+def build_partitions(base_path):
+    return write_partitions(read_csv(base_path, 'orders'), read_csv(base_path, 'order_items'),
+                            load_table(base_path, 'products'), base_path)
+
+
+def build_snapshot(base_path, names=None):
+    names = names or TABLE_SCHEMAS
+    for name in names:
+        if name not in PARTITIONED_TABLES:
+            write_snapshot(read_csv(base_path, name), base_path, name)
+    if any(name in PARTITIONED_TABLES for name in names):
+        build_partitions(base_path)
+
+
+# Partições de orders e order_items por mês, carregadas sob demanda. Sem snapshot
+# (ou sem permissão de escrita para reconstruí-lo) os CSVs são lidos e divididos em memória.
+# Com compact=True as partições são entregues no esquema compacto (ver compact.py).
+class PartitionStore:
+    def __init__(self, base_path, compact=False):
+        self.base_path = base_path
+        self.compact = compact
+        self.manifest = read_manifest(base_path)
+        self._memory = None
+        # Manifestos anteriores ao resumo das partições e gerações publicadas que não
+        # existem mais também são regravados
+        if self.manifest is not None and (partitions_stale(base_path) or 'ids' not in self.manifest
+                                          or not os.path.exists(summary_path(base_path, self.manifest))):
+            try:
+                self.manifest = build_partitions(base_path)
+            except OSError:
+                self.manifest = None  # Sistema de arquivos somente leitura: segue com os CSVs
+        if self.manifest is None:
+            self._read_csvs()
+            self.months = sorted(self._memory)
+        else:
+            self.months = list(self.manifest['months'])
+
+    def _read_csvs(self):
+        self._memory = {month: self._compact(tables) for month, tables in
+                        split_by_month(read_csv(self.base_path, 'orders'),
+                                       read_csv(self.base_path, 'order_items')).items()}
+
+    def _compact(self, tables):
+        if not self.compact:
+            return tables
+        return tuple(compact_table(df, name) for name, df in zip(PARTITIONED_TABLES, tables))
+
+    # orders e order_items de um mês; se a geração foi removida, os CSVs passam a ser usados
+    def load(self, month):
+        if self._memory is None:
+            try:
+                return self._compact(tuple(feather.read_table(partition_path(self.base_path, self.manifest, name, month),
+                                                              memory_map=True).to_pandas()
+                                           for name in PARTITIONED_TABLES))
+            except FileNotFoundError:
+                self._read_csvs()
+        return self._memory[month]
+
+    # Resumo das partições, agregados do RFM e intervalos de IDs de cada mês (ver
+    # partition_summary.py): lidos do summary.pickle, sem abrir as partições.
+    # Chame antes de usar months (sem o resumo, os meses passam a vir dos CSVs).
+    def load_summary(self, products):
+        if self.manifest is not None:
+            try:
+                with open(summary_path(self.base_path, self.manifest), 'rb') as f:
+                    summary, aggregates = pickle.load(f)
+                return summary, aggregates, self.manifest['ids']
+            except FileNotFoundError:
+                self.manifest = None  # Geração removida: segue com os CSVs
+                self._read_csvs()
+                self.months = sorted(self._memory)
+        return summarize_partitions(((month, *tables) for month, tables in self._memory.items()), products)
+
+    # Itens de pedido de um mês (0 para meses sem partição gravada)
+    def rows(self, month):
+        if self.manifest is None:
+            return len(self._memory[month][1]) if month in self._memory else 0
+        return self.manifest['rows']['order_items'].get(month, 0)
+
+    def load_table(self, name):
+        frames = [self.load(month)[PARTITIONED_TABLES.index(name)] for month in self.months]
+        return concat_tables(*frames) if frames else read_csv(self.base_path, name).iloc[0:0]
+
+
+# Carrega uma tabela: snapshot atualizado, snapshot reconstruído ou CSV puro
+def load_table(base_path, name):
+    if name in PARTITIONED_TABLES:
+        return PartitionStore(base_path).load_table(name)
+    path = snapshot_path(base_path, name)
+    if not os.path.exists(path):
+        return read_csv(base_path, name)
+    if is_stale(base_path, name):
+        df = read_csv(base_path, name)
+        try:
+            write_snapshot(df, base_path, name)
+        except OSError:
+            pass  # Sistema de arquivos somente leitura: segue com o CSV
+        return df
+    return feather.read_table(path, memory_map=True).to_pandas()
+
+
+def load_tables(base_path, names=None):
+    return {name: load_table(base_path, name) for name in names or TABLE_SCHEMAS}
+
+
+if __name__ == "__main__":
+    target = sys.argv[1] if len(sys.argv) > 1 else os.path.join(os.path.dirname(os.path.abspath(__file__)), "Ecommerce_Dataset")
+    build_snapshot(target)
+    print(f"Snapshot gerado em {os.path.join(target, SNAPSHOT_DIR)}")
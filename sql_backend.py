@@ -0,0 +1,342 @@
+# =============================================================================
+# BACKEND SQL (SQLITE) COM FILTROS EMPURRADOS PARA O BANCO
+# =============================================================================
+# Alternativa ao backend em memória (memory_backend.py) para bases que não cabem
+# na RAM do worker: as tabelas de create_tables.sql e a segmentação RFM ficam em
+# um arquivo SQLite (Ecommerce_Dataset/_snapshot/ecommerce.db), com índices em
+# orders(order_date, status, customer_id) e order_items(order_id, product_id).
+# Os filtros do dashboard viram cláusulas WHERE parametrizadas (meses como
+# intervalos de order_date, para usar o índice) e KPIs e gráficos são agregados
+# pelo banco, por conexões somente leitura reaproveitadas de um pool.
+# O banco é reconstruído quando algum CSV ou o create_tables.sql é mais novo.
+# Lotes de Ecommerce_Dataset/incoming são incorporados apenas pelo backend em memória.
+# Para gerar o banco: python sql_backend.py [caminho_do_Ecommerce_Dataset]
+
+import os
+import pathlib
+import queue
+import sqlite3
+import sys
+import threading
+from contextlib import contextmanager
+
+import pandas as pd
+
+import snapshot
+from rfm import compute_rfm
+from schema import create_table_statements
+
+DATABASE_FILE = "ecommerce.db"
+SOURCE_TABLES = ['customers', 'products', 'orders', 'order_items']
+
+INDEXES = [
+    "CREATE INDEX idx_orders_date_status_customer ON orders (order_date, status, customer_id)",
+    "CREATE INDEX idx_order_items_order_product ON order_items (order_id, product_id)",
+    "CREATE UNIQUE INDEX idx_rfm_segmentation_customer ON rfm_segmentation (customer_id)",
+]
+
+# Parâmetro do filtro -> coluna da consulta (meses são tratados à parte)
+FILTER_COLUMNS = {
+    'categories': 'p.category',
+    'statuses': 'o.status',
+    'states': 'c.state',
+    'rfm_segments': 'r.segment',
+}
+
+# Itens de pedido com as dimensões dos filtros (equivalente à tabela fato)
+FACT_FROM = """
+FROM orders o
+JOIN order_items oi ON oi.order_id = o.order_id
+JOIN products p ON p.product_id = oi.product_id
+LEFT JOIN customers c ON c.customer_id = o.customer_id
+LEFT JOIN rfm_segmentation r ON r.customer_id = o.customer_id
+"""
+
+ITEM_REVENUE = "oi.quantity * oi.unit_price"
+ORDER_MONTH = "substr(o.order_date, 1, 7)"
+
+
+def database_path(base_path):
+    return os.path.join(base_path, snapshot.SNAPSHOT_DIR, DATABASE_FILE)
+
+
+# O banco está desatualizado quando não existe ou algum arquivo de origem é mais novo
+def is_stale(base_path, path):
+    if not os.path.exists(path):
+        return True
+    sources = [snapshot.csv_path(base_path, name) for name in SOURCE_TABLES]
+    sources.append(os.path.join(base_path, 'create_tables.sql'))
+    built = os.path.getmtime(path)
+    return any(os.path.getmtime(source) > built for source in sources)
+
+
+# Datas como texto ISO (YYYY-MM-DD) e categorias como valores simples
+def _sql_values(df):
+    columns = {}
+    for col in df.columns:
+        if pd.api.types.is_datetime64_any_dtype(df[col]):
+            columns[col] = df[col].dt.strftime('%Y-%m-%d')
+        elif isinstance(df[col].dtype, pd.CategoricalDtype):
+            columns[col] = df[col].astype(object)
+    return df.assign(**columns)
+
+
+# Cria o banco em um arquivo temporário deste processo e o publica de forma atômica
+def build_database(base_path, path=None):
+    path = path or database_path(base_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(os.path.join(base_path, 'create_tables.sql'), encoding='utf-8') as f:
+        statements = create_table_statements(f.read())
+    tables = snapshot.load_tables(base_path, SOURCE_TABLES)
+
+    def write(tmp_path):
+        conn = sqlite3.connect(tmp_path)
+        try:
+            for statement in statements:
+                conn.execute(statement)
+            for name in SOURCE_TABLES:
+                _sql_values(tables[name]).to_sql(name, conn, if_exists='append', index=False)
+            rfm = compute_rfm(tables['orders'], tables['customers'])
+            _sql_values(rfm).to_sql('rfm_segmentation', conn, index=False)
+            for statement in INDEXES:
+                conn.execute(statement)
+            conn.execute("ANALYZE")
+            conn.commit()
+        finally:
+            conn.close()
+
+    snapshot.atomic_write(path, write)
+    return path
+
+
+# Intervalos [início, fim) de order_date para os meses selecionados, unindo meses consecutivos
+def month_ranges(months):
+    ranges = []
+    for period in sorted(pd.Period(m, 'M') for m in months):
+        start, end = period.strftime('%Y-%m-01'), (period + 1).strftime('%Y-%m-01')
+        if ranges and ranges[-1][1] == start:
+            ranges[-1][1] = end
+        else:
+            ranges.append([start, end])
+    return ranges
+
+
+def _in(column, values, params):
+    params.extend(values)
+    return f"{column} IN ({', '.join('?' * len(values))})"
+
+
+def _months_clause(months, params):
+    ranges = month_ranges(months)
+    if not ranges:
+        return "0"
+    for start, end in ranges:
+        params.extend([start, end])
+    return "(" + " OR ".join("(o.order_date >= ? AND o.order_date < ?)" for _ in ranges) + ")"
+
+
+# Cláusula WHERE parametrizada da seleção de filtros
+def where_clause(selection):
+    params = []
+    clauses = [_months_clause(selection['months'], params)]
+    for dim, column in FILTER_COLUMNS.items():
+        # Segmento RFM só filtra quando há seleção
+        if dim == 'rfm_segments' and not selection[dim]:
+            continue
+        clauses.append(_in(column, list(selection[dim]), params))
+    return " AND ".join(clauses), params
+
+
+class ConnectionPool:
+    def __init__(self, path, size=4):
+        self.uri = pathlib.Path(path).absolute().as_uri() + "?mode=ro"
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.uri, uri=True, check_same_thread=False)
+        conn.execute("PRAGMA query_only = ON")
+        return conn
+
+    # Empresta uma conexão (no máximo `size` em uso ao mesmo tempo)
+    @contextmanager
+    def connection(self):
+        with self._slots:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = self._connect()
+            try:
+                yield conn
+            finally:
+                self._idle.put(conn)
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+class SQLBackend:
+    name = 'sqlite'
+    supports_approximate = False
+
+    def __init__(self, base_path, path=None, pool_size=4):
+        self.base_path = base_path
+        self.path = path or database_path(base_path)
+        self.pool_size = pool_size
+        self.rejected = {}
+        self.version = None
+        self.pool = None
+        self._lock = threading.Lock()
+        self.refresh()
+
+    # Reconstrói o banco se os CSVs mudaram e troca o pool quando o arquivo muda
+    def refresh(self):
+        with self._lock:
+            if is_stale(self.base_path, self.path):
+                try:
+                    build_database(self.base_path, self.path)
+                except OSError:
+                    if not os.path.exists(self.path):
+                        raise
+            version = os.stat(self.path).st_mtime_ns
+            if version != self.version:
+                old_pool = self.pool
+                self.pool = ConnectionPool(self.path, self.pool_size)
+                self.version = version
+                if old_pool is not None:
+                    old_pool.close()
+        return self.version
+
+    # Os dados ficam no banco: nada é mantido em memória além dos resultados das consultas
+    def memory_usage(self):
+        return {}
+
+    def query(self, sql, params=(), **kwargs):
+        with self.pool.connection() as conn:
+            return pd.read_sql_query(sql, conn, params=list(params), **kwargs)
+
+    def _values(self, sql):
+        with self.pool.connection() as conn:
+            return [row[0] for row in conn.execute(sql)]
+
+    # Valores disponíveis em cada filtro
+    def options(self):
+        return {
+            'months': self._values("SELECT DISTINCT substr(order_date, 1, 7) FROM orders ORDER BY 1"),
+            'categories': self._values("SELECT DISTINCT category FROM products ORDER BY 1"),
+            'statuses': self._values("SELECT DISTINCT status FROM orders ORDER BY 1"),
+            'states': self._values("SELECT DISTINCT state FROM customers ORDER BY 1"),
+            'rfm_segments': self._values("SELECT DISTINCT segment FROM rfm_segmentation ORDER BY 1"),
+        }
+
+    # Itens de pedido que passam nos filtros
+    def matching_rows(self, selection):
+        where, params = where_clause(selection)
+        with self.pool.connection() as conn:
+            return conn.execute(f"SELECT COUNT(*) {FACT_FROM} WHERE {where}", params).fetchone()[0]
+
+    # Clientes únicos são sempre exatos (COUNT DISTINCT no banco)
+    def kpis(self, selection, approximate_customers=False):
+        where, params = where_clause(selection)
+        sql = f"""
+            SELECT COALESCE(SUM({ITEM_REVENUE}), 0) AS total_revenue,
+                   COUNT(DISTINCT o.customer_id) AS unique_customers,
+                   COUNT(DISTINCT o.order_id) AS total_orders,
+                   COUNT(DISTINCT CASE WHEN o.status = 'Entregue' THEN o.order_id END) AS delivered_orders
+            {FACT_FROM}
+            WHERE {where}"""
+        with self.pool.connection() as conn:
+            total_revenue, unique_customers, total_orders, delivered_orders = conn.execute(sql, params).fetchone()
+            n_orders = conn.execute("SELECT COUNT(*) FROM orders").fetchone()[0]
+        avg_ticket = total_revenue / total_orders if total_orders > 0 else 0
+        avg_orders_per_customer = total_orders / unique_customers if unique_customers > 0 else 0
+        conversion_rate = (delivered_orders / n_orders) * 100 if n_orders > 0 else 0
+        return total_revenue, unique_customers, total_orders, avg_ticket, avg_orders_per_customer, conversion_rate
+
+    def _grouped(self, column, alias, measure, name, selection, order_by=None):
+        where, params = where_clause(selection)
+        sql = f"""
+            SELECT {column} AS {alias}, {measure} AS {name}
+            {FACT_FROM}
+            WHERE {where}
+            GROUP BY {column}
+            ORDER BY {order_by or alias}"""
+        return self.query(sql, params)
+
+    def visualizations(self, selection, approximate_customers=False):
+        revenue = f"SUM({ITEM_REVENUE})"
+
+        # Top 5 Produtos (usando dados brutos para todas as categorias)
+        top_products = self.query(f"""
+            SELECT p.product_name, p.category, SUM({ITEM_REVENUE}) AS total_revenue
+            FROM order_items oi
+            JOIN orders o ON o.order_id = oi.order_id
+            JOIN products p ON p.product_id = oi.product_id
+            GROUP BY p.product_name, p.category
+            ORDER BY total_revenue DESC
+            LIMIT 5""")
+
+        # Receita por Categoria, por Estado e Mensal (com filtros)
+        revenue_by_category = self._grouped("p.category", "category", revenue, "total_revenue", selection)
+        revenue_by_state = self._grouped("c.state", "state", revenue, "total_revenue", selection)
+        revenue_monthly = self._grouped(ORDER_MONTH, "order_date", revenue, "total_amount", selection)
+
+        # Status de Pedidos (com filtros)
+        status_counts = self._grouped("o.status", "status", "COUNT(DISTINCT o.order_id)", "count", selection,
+                                      order_by="count DESC, status")
+
+        # Clientes Únicos e Pedidos Totais por Mês (com filtros)
+        monthly_customers = self._grouped(ORDER_MONTH, "order_date", "COUNT(DISTINCT o.customer_id)",
+                                          "unique_customers", selection)
+        total_orders_by_month = self._grouped(ORDER_MONTH, "order_date", "COUNT(DISTINCT o.order_id)",
+                                              "total_orders", selection)
+
+        # Clientes por Categoria (usando dados brutos)
+        clientes_categoria = self.query("""
+            SELECT p.category, COUNT(DISTINCT o.customer_id) AS unique_customers
+            FROM order_items oi
+            JOIN orders o ON o.order_id = oi.order_id
+            JOIN products p ON p.product_id = oi.product_id
+            GROUP BY p.category
+            ORDER BY p.category""")
+
+        return top_products, revenue_by_category, revenue_by_state, revenue_monthly, status_counts, monthly_customers, total_orders_by_month, clientes_categoria
+
+    def customers_by_state(self):
+        return self.query("SELECT state, COUNT(*) AS count FROM customers GROUP BY state ORDER BY count DESC, state")
+
+    # Mês do primeiro pedido de cada cliente (todos os status)
+    def new_customers_monthly(self):
+        return self.query("""
+            SELECT substr(first_order, 1, 7) AS month, COUNT(*) AS new_customers
+            FROM (SELECT customer_id, MIN(order_date) AS first_order FROM orders GROUP BY customer_id)
+            GROUP BY month
+            ORDER BY month""")
+
+    def rfm_table(self):
+        return self.query("SELECT * FROM rfm_segmentation ORDER BY customer_id")
+
+    # RFM recalculado só com os pedidos entregues dos meses e estados selecionados
+    # (mesma data de referência da segmentação completa)
+    def segment_population(self, months, states):
+        params = []
+        months_clause = _months_clause(months, params)
+        population = self.query(f"""
+            SELECT o.order_id, o.customer_id, o.order_date, o.total_amount, o.status
+            FROM orders o
+            JOIN customers c ON c.customer_id = o.customer_id
+            WHERE {months_clause} AND o.status = 'Entregue' AND {_in('c.state', list(states), params)}""",
+                                params, parse_dates=['order_date'])
+        customers = self.query("SELECT customer_id, customer_name FROM customers")
+        last_date = self._values("SELECT MAX(order_date) FROM orders")[0]
+        reference_date = pd.Timestamp(last_date).normalize() + pd.Timedelta(days=1)
+        return compute_rfm(population, customers, reference_date)
+
+
+if __name__ == "__main__":
+    target = sys.argv[1] if len(sys.argv) > 1 else os.path.join(os.path.dirname(os.path.abspath(__file__)), "Ecommerce_Dataset")
+    print(f"Banco SQLite gerado em {build_database(target)}")